@@ -1,35 +1,83 @@
 #  Libraries
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import seaborn as sns
 import matplotlib.pyplot as plt
+import os
 from datetime import datetime
+from report_data import load_data, load_shared_data, dataset_modified
+from report_cache import ReportCache, source_version
+from report_export import EXPORT_FORMATS, export_report, label_tables, safe_name
+
+# Function for drawing a daily trend line with its 7/28-day totals and the latest week-over-week change
+def show_trend(trend, daily_label):
+    st.line_chart(trend[[daily_label, '7-Day Total', '28-Day Total']])
+
+    latest = trend.iloc[-1]
+    col1, col2 = st.columns(2)
+    col1.metric(f"{daily_label} (last 7 days)", int(latest['7-Day Total']),
+                delta=int(latest['Week-over-Week Change']), help="Change compared with the 7 days before")
+    col2.metric(f"{daily_label} (last 28 days)", int(latest['28-Day Total']))
+
+# Function for showing a table one page at a time; search, sort and slicing happen on the server
+# so only the visible rows are sent to the browser. `token` identifies the table contents
+# (e.g. report, org and date range): search text and sort orders are built once per token.
+def paginated_table(table, key, token, page_size=25):
+    if len(table) <= page_size:
+        st.dataframe(table)
+        return
 
-# Function for generating the Account Report in Streamlit
-def from_code_account_report(access_logs, users, organizations, sparks):
-    # Select an organization from dropdown
-    org_options = organizations[['Organization ID', 'Organization Name']].drop_duplicates()
-    org_name = st.selectbox("Select an Account (Organization)", org_options['Organization Name'], key="org_select_1")
-    org_id = org_options[org_options['Organization Name'] == org_name]['Organization ID'].values[0]
+    # Build the search text once, and remember sort orders as they are requested
+    index = st.session_state.get(f"{key}_index")
+    if index is None or index['token'] != token or len(index['search_text']) != len(table):
+        search_text = table.iloc[:, 0].astype(str)
+        for col in table.columns[1:]:
+            search_text = search_text + ' ' + table[col].astype(str)
+        index = {'token': token, 'search_text': search_text.str.lower().reset_index(drop=True), 'orders': {}}
+        st.session_state[f"{key}_index"] = index
+
+    col1, col2, col3 = st.columns([2, 2, 1])
+    query = col1.text_input("Search", key=f"{key}_search")
+    sort_col = col2.selectbox("Sort by", [None] + list(table.columns), key=f"{key}_sort",
+                              format_func=lambda c: "Original order" if c is None else c)
+    descending = col3.checkbox("Descending", key=f"{key}_desc")
+
+    # Row positions in display order
+    if sort_col is None:
+        order = np.arange(len(table))
+    else:
+        if (sort_col, descending) not in index['orders']:
+            sort_keys = table[sort_col].reset_index(drop=True)
+            index['orders'][(sort_col, descending)] = sort_keys.sort_values(ascending=not descending, kind='stable').index.to_numpy()
+        order = index['orders'][(sort_col, descending)]
+
+    # Keep only rows that match the search text
+    if query:
+        matches = index['search_text'].str.contains(query.lower(), regex=False).to_numpy()
+        order = order[matches[order]]
+
+    # Clamp the page before drawing the widget in case the search shrank the table
+    n_pages = max((len(order) + page_size - 1) // page_size, 1)
+    if st.session_state.get(f"{key}_page", 1) > n_pages:
+        st.session_state[f"{key}_page"] = n_pages
+    page = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key=f"{key}_page")
+
+    page_rows = order[(page - 1) * page_size:page * page_size]
+    st.dataframe(table.iloc[page_rows])
+    if len(order) > 0:
+        st.caption(f"Showing rows {(page - 1) * page_size + 1}-{(page - 1) * page_size + len(page_rows)} of {len(order)}")
+    else:
+        st.caption("No rows match the search.")
+
+# Function for computing the Account Report tables for one organization and date range
+def account_report_tables(data, org_id, start_date, end_date):
+    access_logs, users = data.access_logs, data.users
 
     # Filter users belonging to the selected organization
     org_users = users[users['Organization ID'] == org_id]
 
-    # Display the range of available dates
-    min_date = access_logs['Timestamp'].min().date()
-    max_date = access_logs['Timestamp'].max().date()
-    st.markdown(f"🗓️ **Available Date Range:** {min_date} to {max_date}")
-
-    # Select start and end date within available range
-    start_date = st.date_input("Start Date", value=min_date, min_value=min_date, max_value=max_date, key="start_date_input_1")
-    end_date = st.date_input("End Date", value=max_date, min_value=min_date, max_value=max_date, key="start_date_input_2")
-
-    # Ensure valid date selection
-    if start_date > end_date:
-        st.error("Start date must be before end date.")
-        return
-
     # Filter access logs based on organization users and date range
     filtered_logs = access_logs[
         (access_logs['User ID'].isin(org_users['User ID'])) &
@@ -37,26 +85,13 @@ def from_code_account_report(access_logs, users, organizations, sparks):
         (access_logs['Timestamp'].dt.date <= end_date)
     ]
 
-    # --- Organization Summary ---
-    st.subheader("Account Info")
-    st.markdown(f"**Organization:** {org_name}")
-    st.markdown(f"**Total Users:** {org_users.shape[0]}")
-
     # --- User List Table ---
-    st.subheader("User List")
     user_list_df = org_users[['First Name', 'Last Name', 'User Email']].copy()
     user_list_df['Full Name'] = user_list_df['First Name'] + ' ' + user_list_df['Last Name']
     user_table = user_list_df[['Full Name', 'User Email']].sort_values(by='Full Name')
-    st.dataframe(user_table.reset_index(drop=True))
 
     # --- Work Site Table ---
-    st.subheader("Site List")
-    unique_sites = org_users['Work Address'].dropna().unique()
-    if len(unique_sites) > 0:
-        site_table = pd.DataFrame(sorted(unique_sites), columns=['Work Address'])
-        st.dataframe(site_table.reset_index(drop=True))
-    else:
-        st.write("No site information available.")
+    site_table = data.site_list(org_users['Site ID']).to_frame()
 
     # --- Define resource interaction columns ---
     resource_cols = [
@@ -67,32 +102,18 @@ def from_code_account_report(access_logs, users, organizations, sparks):
 
     # --- List of Sparks accessed by users in the date range ---
     accessed_sparks = filtered_logs['Spark ID'].dropna().unique()
-    accessed_spark_names = sparks[sparks['Spark ID'].isin(accessed_sparks)][['Spark ID', 'Name']].rename(columns={'Name': 'Spark Name'})
-
-    st.subheader("Sparks Accessed in Date Range")
-    if not accessed_spark_names.empty:
-        st.dataframe(accessed_spark_names.sort_values('Spark Name').reset_index(drop=True))
-    else:
-        st.write("No Sparks accessed during the selected date range.")
+    accessed_spark_names = pd.DataFrame({'Spark ID': accessed_sparks, 'Spark Name': data.spark_name(accessed_sparks)}).dropna()
 
     # --- Percent of Resources Accessed per Spark ---
     spark_resource_usage = filtered_logs.groupby('Spark ID')[resource_cols].agg('sum').reset_index()
     spark_resource_usage['Resources Accessed'] = (spark_resource_usage[resource_cols] > 0).sum(axis=1)
     spark_resource_usage['Percent Resources Accessed'] = (spark_resource_usage['Resources Accessed'] / len(resource_cols)) * 100
-    spark_resource_usage = spark_resource_usage.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
-    spark_resource_usage.rename(columns={'Name': 'Spark Name'}, inplace=True)
-
-    st.subheader("Percent of Resources Accessed Per Spark")
-    st.dataframe(spark_resource_usage[['Spark Name', 'Percent Resources Accessed']])
+    spark_resource_usage['Spark Name'] = data.spark_name(spark_resource_usage['Spark ID'])
 
     # --- User Sessions per Spark ---
     spark_sessions = filtered_logs.groupby('Spark ID')['Access ID'].nunique().reset_index()
     spark_sessions.rename(columns={'Access ID': 'User Sessions'}, inplace=True)
-    spark_sessions = spark_sessions.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
-    spark_sessions.rename(columns={'Name': 'Spark Name'}, inplace=True)
-
-    st.subheader("Number of User Sessions per Spark")
-    st.dataframe(spark_sessions[['Spark Name', 'User Sessions']])
+    spark_sessions['Spark Name'] = data.spark_name(spark_sessions['Spark ID'])
 
     # --- Daily Spark Summary (Sessions & Resources Used) ---
     spark_summary = filtered_logs.groupby([filtered_logs['Timestamp'].dt.date, 'Spark ID'])[resource_cols + ['Access ID']].agg(
@@ -101,14 +122,86 @@ def from_code_account_report(access_logs, users, organizations, sparks):
     spark_summary['Total Resources Used'] = spark_summary[resource_cols].sum(axis=1)
     spark_summary['Percent Resources Used'] = (spark_summary['Total Resources Used'] / len(resource_cols)).clip(upper=1) * 100
     spark_summary.rename(columns={'Access ID': 'User Sessions'}, inplace=True)
-    spark_summary = spark_summary.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
-    spark_summary.rename(columns={'Name': 'Spark Name'}, inplace=True)
+    spark_summary['Spark Name'] = data.spark_name(spark_summary['Spark ID'])
 
+    # --- Session lengths for the box plot ---
+    session_lengths = filtered_logs[['Spark ID', 'Session Length (min)']].dropna()
+    session_lengths['Name'] = data.spark_name(session_lengths['Spark ID'])
+
+    return {
+        'User List': user_table.reset_index(drop=True),
+        'Site List': site_table.reset_index(drop=True),
+        'Sparks Accessed': accessed_spark_names.sort_values('Spark Name').reset_index(drop=True),
+        'Percent of Resources Accessed Per Spark': spark_resource_usage[['Spark Name', 'Percent Resources Accessed']],
+        'User Sessions per Spark': spark_sessions[['Spark Name', 'User Sessions']],
+        'Spark Engagement Summary': spark_summary[['Spark Name', 'User Sessions', 'Percent Resources Used', 'Timestamp']],
+        'Session Lengths': session_lengths[['Name', 'Session Length (min)']],
+    }
+
+# Function for generating the Account Report in Streamlit
+def from_code_account_report(data):
+    access_logs, organizations = data.access_logs, data.organizations
+
+    # Select an organization from dropdown
+    org_id = st.selectbox("Select an Account (Organization)", organizations['Organization ID'].unique(),
+                          format_func=lambda i: data.org_names[i], key="org_select_1")
+    org_name = data.org_names[org_id]
+
+    # Display the range of available dates
+    min_date = access_logs['Timestamp'].min().date()
+    max_date = access_logs['Timestamp'].max().date()
+    st.markdown(f"🗓️ **Available Date Range:** {min_date} to {max_date}")
+
+    # Select start and end date within available range
+    start_date = st.date_input("Start Date", value=min_date, min_value=min_date, max_value=max_date, key="start_date_input_1")
+    end_date = st.date_input("End Date", value=max_date, min_value=min_date, max_value=max_date, key="start_date_input_2")
+
+    # Ensure valid date selection
+    if start_date > end_date:
+        st.error("Start date must be before end date.")
+        return
+
+    # Computed tables (from the report cache when this org and date range were seen before)
+    tables = cached_report_tables(data, 'account', org_id, start_date, end_date)
+    token = (data.fingerprint, org_id, start_date, end_date)
+
+    # --- Organization Summary ---
+    st.subheader("Account Info")
+    st.markdown(f"**Organization:** {org_name}")
+    st.markdown(f"**Total Users:** {tables['User List'].shape[0]}")
+
+    # --- User List Table ---
+    st.subheader("User List")
+    paginated_table(tables['User List'], "account_users", token)
+
+    # --- Work Site Table ---
+    st.subheader("Site List")
+    if len(tables['Site List']) > 0:
+        st.dataframe(tables['Site List'])
+    else:
+        st.write("No site information available.")
+
+    # --- List of Sparks accessed by users in the date range ---
+    st.subheader("Sparks Accessed in Date Range")
+    if not tables['Sparks Accessed'].empty:
+        st.dataframe(tables['Sparks Accessed'])
+    else:
+        st.write("No Sparks accessed during the selected date range.")
+
+    # --- Percent of Resources Accessed per Spark ---
+    st.subheader("Percent of Resources Accessed Per Spark")
+    st.dataframe(tables['Percent of Resources Accessed Per Spark'])
+
+    # --- User Sessions per Spark ---
+    st.subheader("Number of User Sessions per Spark")
+    st.dataframe(tables['User Sessions per Spark'])
+
+    # --- Daily Spark Summary (Sessions & Resources Used) ---
     st.subheader("Spark Engagement Summary")
-    st.dataframe(spark_summary[['Spark Name', 'User Sessions', 'Percent Resources Used', 'Timestamp']])
+    paginated_table(tables['Spark Engagement Summary'], "account_spark_summary", token)
 
     # --- Bar Chart: Percent of Resources Accessed per Spark ---
-    resource_usage_per_spark = spark_resource_usage[['Spark Name', 'Percent Resources Accessed']]
+    resource_usage_per_spark = tables['Percent of Resources Accessed Per Spark']
     fig1 = px.bar(
         resource_usage_per_spark,
         x='Spark Name',
@@ -122,8 +215,7 @@ def from_code_account_report(access_logs, users, organizations, sparks):
     st.plotly_chart(fig1)
 
     # --- Box Plot: Session Length per Spark ---
-    session_lengths = filtered_logs[['Spark ID', 'Session Length (min)']].dropna()
-    session_lengths = session_lengths.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
+    session_lengths = tables['Session Lengths']
 
     fig2 = px.box(
         session_lengths,
@@ -137,15 +229,18 @@ def from_code_account_report(access_logs, users, organizations, sparks):
     fig2.update_traces(line=dict(width=10))  # Optional visual enhancement for trace lines
     st.plotly_chart(fig2)
 
-def from_code_individual_report(access_logs, users, organizations, sparks):
-    
-    # Create a full name column for user selection
-    users['Full Name'] = users['First Name'] + ' ' + users['Last Name']
-    selected_user_name = st.selectbox("Select a User", users['Full Name'].unique())
+    # --- Export ---
+    export_org_report(data, 'account', tables, org_id, start_date, end_date)
+
+def from_code_individual_report(data):
+    access_logs, users = data.access_logs, data.users
 
-    # Get the selected user's row and extract User ID
-    selected_user = users[users['Full Name'] == selected_user_name].iloc[0]
-    user_id = selected_user['User ID']
+    # Select a user by ID, showing full names
+    user_id = st.selectbox("Select a User", users['User ID'], format_func=lambda i: data.user_names[i])
+    selected_user_name = data.user_names[user_id]
+
+    # Get the selected user's row
+    selected_user = data.user(user_id)
     
     # Define the available date range based on access log timestamps
     min_date = access_logs['Timestamp'].min().date()
@@ -160,16 +255,15 @@ def from_code_individual_report(access_logs, users, organizations, sparks):
     if start_date > end_date:
         st.error("Start date must be before end date.")
     else:
-        # Filter logs to only include entries for the selected user and date range
-        user_logs = access_logs[
-            (access_logs['User ID'] == user_id) &
-            (access_logs['Timestamp'].dt.date >= start_date) &
-            (access_logs['Timestamp'].dt.date <= end_date)
-        ]
+        # Entries of the selected user in the date range (only that user's rows are scanned)
+        user_logs = data.user_logs(user_id, start_date, end_date)
+
+        # Activity counts and minutes (from the per-user summary when the whole range is selected)
+        user_activity = data.user_activity(user_id, start_date, end_date)
 
         # Get organization and site info
         org_id = selected_user['Organization ID']
-        organization_name = organizations.loc[organizations['Organization ID'] == org_id, 'Organization Name'].values[0]
+        organization_name = data.org_names[org_id]
         site = selected_user['Work Address']
 
         # Display user information
@@ -181,28 +275,12 @@ def from_code_individual_report(access_logs, users, organizations, sparks):
 
         st.subheader("Session Time per Resource")
 
-        # Define possible activities
-        activities = [
-            'Viewed Slideshow', 'Downloaded Slideshow', 'Watched Tutorial Video',
-            'Accessed Extension Activities', 'Used AI Playbook Maker',
-            'Downloaded AI Playbook', 'Booked Support Session'
-        ]
-
-        # Reshape log data to long format for activities
-        activity_logs = user_logs[['Timestamp'] + activities + ['Session Length (min)']]
-        activity_logs = activity_logs.melt(
-            id_vars=['Timestamp', 'Session Length (min)'],
-            value_vars=activities,
-            var_name='Activity',
-            value_name='Performed'
+        # Summarize session time by activity (performed activities only)
+        session_time_per_activity = (
+            user_activity.loc[user_activity['Count'] > 0, 'Minutes']
+            .rename('Session Length (min)').sort_index().reset_index()
         )
 
-        # Keep only performed activities
-        activity_logs = activity_logs[activity_logs['Performed'] == 1]
-
-        # Summarize session time by activity
-        session_time_per_activity = activity_logs.groupby('Activity')['Session Length (min)'].sum().reset_index()
-
         # Bar chart: total session time per activity
         fig = px.bar(
             session_time_per_activity,
@@ -224,14 +302,14 @@ def from_code_individual_report(access_logs, users, organizations, sparks):
 
         st.subheader("User Activity Timeline")
 
-        # Reuse the same list of activities
+        # Define possible activities
         activities = [
             'Viewed Slideshow', 'Downloaded Slideshow', 'Watched Tutorial Video',
             'Accessed Extension Activities', 'Used AI Playbook Maker',
             'Downloaded AI Playbook', 'Booked Support Session'
         ]
 
-        # Reshape log data again for timeline visualization
+        # Reshape log data for timeline visualization
         activity_logs = user_logs[['Timestamp'] + activities + ['Session Length (min)']]
         activity_logs = activity_logs.melt(
             id_vars=['Timestamp', 'Session Length (min)'],
@@ -267,17 +345,8 @@ def from_code_individual_report(access_logs, users, organizations, sparks):
 
         st.subheader("Resource Usage Summary")
 
-        # Summarize total usage of each resource
-        resource_cols = [
-            'Viewed Slideshow', 'Downloaded Slideshow', 'Watched Tutorial Video',
-            'Accessed Extension Activities', 'Used AI Playbook Maker',
-            'Downloaded AI Playbook', 'Booked Support Session'
-        ]
-
-        resource_totals = user_logs[resource_cols].sum().reset_index()
-        resource_totals.columns = ['Resource', 'Count']
-
         # Keep only resources with at least one usage
+        resource_totals = user_activity['Count'].rename_axis('Resource').reset_index()
         resource_totals = resource_totals[resource_totals['Count'] > 0]
 
         # Pie chart: distribution of resource usage
@@ -290,16 +359,99 @@ def from_code_individual_report(access_logs, users, organizations, sparks):
         )
 
         st.plotly_chart(fig2, use_container_width=True)
+
+        # Export the user's activity and accesses, or the summary of every user
+        export_section("individual", f"individual_{safe_name(selected_user_name)}_{start_date}_{end_date}",
+                       {'User Activity': user_activity, 'Accesses': user_logs},
+                       "All users (summary)", "individual_all_users",
+                       lambda: [{'User Summary': data.user_summary}])
+
+    # Leaderboard over the whole log, read straight from the per-user summary
+    st.subheader("Top Users")
+    rank_by = st.selectbox("Rank by", ['Sessions', 'Total Session Length (min)', 'Mean Session Length (min)'],
+                           key="top_users_rank")
+    top_users = data.user_summary.nlargest(10, rank_by, keep='first')
+    st.dataframe(top_users[['Name', 'Organization', 'Sessions', 'Total Session Length (min)',
+                            'Mean Session Length (min)', 'Last Seen']].reset_index(drop=True))
         
         
-def from_code_resource_type_report(access_logs, users, organizations, sparks):
-    # Dropdown to select organization
-    org_options = organizations[['Organization ID', 'Organization Name']].drop_duplicates()
-    org_name = st.selectbox("Select an Account (Organization)", org_options['Organization Name'], key="org_select_2")
-    org_id = org_options[org_options['Organization Name'] == org_name]['Organization ID'].values[0]
+# Function for computing the Resource Type Report tables for one organization and date range
+def resource_type_report_tables(data, org_id, start_date, end_date):
+    access_logs, users = data.access_logs, data.users
 
     # Filter users that belong to the selected organization
     org_users = users[users['Organization ID'] == org_id]
+
+    # Filter access logs by user IDs and date range
+    filtered_logs = access_logs[
+        (access_logs['User ID'].isin(org_users['User ID'])) &
+        (access_logs['Timestamp'].dt.date >= start_date) &
+        (access_logs['Timestamp'].dt.date <= end_date)
+    ]
+
+    # List of users in the organization
+    user_list_df = org_users[['First Name', 'Last Name', 'User Email']].copy()
+    user_list_df['Full Name'] = user_list_df['First Name'] + ' ' + user_list_df['Last Name']
+    user_list_df = user_list_df[['Full Name', 'User Email']]
+
+    # Unique site addresses for the organization
+    unique_sites = data.site_list(org_users['Site ID']).to_frame().reset_index(drop=True)
+    unique_sites.index += 1
+    unique_sites.columns = ['Site']
+
+    # Define the resource columns to track
+    resource_cols = ['Viewed Slideshow', 'Downloaded Slideshow', 'Watched Tutorial Video', 'Downloaded AI Playbook']
+
+    # Count distinct user sessions per Spark
+    user_sessions_per_spark = filtered_logs.groupby('Spark ID')['User ID'].nunique().reset_index()
+    user_sessions_per_spark.rename(columns={'User ID': 'Sessions'}, inplace=True)
+    user_sessions_per_spark['Spark Name'] = data.spark_name(user_sessions_per_spark['Spark ID'])
+
+    # Aggregate resource usage and session data per Spark
+    spark_summary = filtered_logs.groupby('Spark ID')[resource_cols + ['Access ID']].agg({
+        **{col: 'sum' for col in resource_cols},
+        'Access ID': 'nunique'
+    }).reset_index()
+
+    # Calculate total and percent resource usage
+    spark_summary['Total Resources Used'] = spark_summary[resource_cols].sum(axis=1)
+    spark_summary['Percent Resources Used'] = (
+        spark_summary['Total Resources Used'] / len(resource_cols)
+    ).clip(upper=1) * 100
+    spark_summary.rename(columns={'Access ID': 'Sessions'}, inplace=True)
+
+    # Look up Spark names for the summary
+    spark_summary['Spark Name'] = data.spark_name(spark_summary['Spark ID'])
+
+    # Total usage of each resource type
+    total_resource_usage = filtered_logs[resource_cols].sum()
+
+    # Aggregate and reshape resource usage by Spark
+    resource_usage_data = filtered_logs.groupby('Spark ID')[resource_cols].sum().reset_index()
+    resource_usage_data['Name'] = data.spark_name(resource_usage_data['Spark ID'])
+    resource_usage_data.set_index('Name', inplace=True)
+    resource_usage_data = resource_usage_data[resource_cols]
+    resource_usage_reset = resource_usage_data.reset_index()
+
+    # Melt data for plotting
+    melted_data = resource_usage_reset.melt(id_vars='Name', var_name='Resource Type', value_name='Interactions')
+
+    return {
+        'User List': user_list_df,
+        'Site List': unique_sites,
+        'User Sessions per Spark': user_sessions_per_spark[['Spark Name', 'Sessions']],
+        'Spark Engagement Summary': spark_summary[['Spark Name', 'Sessions', 'Percent Resources Used']],
+        'Overall Resource Usage': total_resource_usage.rename_axis('Resource Type').reset_index(name='Interactions'),
+        'Resource Usage per Spark': melted_data,
+    }
+
+def from_code_resource_type_report(data):
+    access_logs, organizations = data.access_logs, data.organizations
+
+    # Dropdown to select organization
+    org_id = st.selectbox("Select an Account (Organization)", organizations['Organization ID'].unique(),
+                          format_func=lambda i: data.org_names[i], key="org_select_2")
+    org_name = data.org_names[org_id]
     
     # Determine the available date range for access logs
     min_date = access_logs['Timestamp'].min().date()
@@ -314,88 +466,46 @@ def from_code_resource_type_report(access_logs, users, organizations, sparks):
     if start_date > end_date:
         st.error("Start date must be before end date.")
     else:
-        # Filter access logs by user IDs and date range
-        filtered_logs = access_logs[
-            (access_logs['User ID'].isin(org_users['User ID'])) &
-            (access_logs['Timestamp'].dt.date >= start_date) &
-            (access_logs['Timestamp'].dt.date <= end_date)
-        ]
+        # Computed tables (from the report cache when this org and date range were seen before)
+        tables = cached_report_tables(data, 'resource_type', org_id, start_date, end_date)
+        token = (data.fingerprint, org_id, start_date, end_date)
 
         # Display organization info and total user count
         st.subheader("Account Info")
         st.markdown(f"**Organization:** {org_name}")
-        st.markdown(f"**Total Users:** {org_users.shape[0]}")
+        st.markdown(f"**Total Users:** {tables['User List'].shape[0]}")
 
         # Display list of users in the organization
         st.subheader("User List")
-        user_list_df = org_users[['First Name', 'Last Name', 'User Email']].copy()
-        user_list_df['Full Name'] = user_list_df['First Name'] + ' ' + user_list_df['Last Name']
-        user_list_df = user_list_df[['Full Name', 'User Email']]
-        st.dataframe(user_list_df)
+        paginated_table(tables['User List'], "resource_users", token)
 
         # Display unique site addresses for the organization
         st.subheader("Site List")
-        unique_sites = org_users[['Work Address']].dropna().drop_duplicates().reset_index(drop=True)
-        unique_sites.index += 1
-        unique_sites.columns = ['Site']
-        st.dataframe(unique_sites)
-
-        # Define the resource columns to track
-        resource_cols = ['Viewed Slideshow', 'Downloaded Slideshow', 'Watched Tutorial Video', 'Downloaded AI Playbook']
-
-        # Count distinct user sessions per Spark
-        user_sessions_per_spark = filtered_logs.groupby('Spark ID')['User ID'].nunique().reset_index()
-        user_sessions_per_spark.rename(columns={'User ID': 'Sessions'}, inplace=True)
-        user_sessions_per_spark = user_sessions_per_spark.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
-        user_sessions_per_spark.rename(columns={'Name': 'Spark Name'}, inplace=True)
+        st.dataframe(tables['Site List'])
 
         # Show Spark sessions in table format
         st.subheader("User Sessions per Spark")
-        st.dataframe(user_sessions_per_spark[['Spark Name', 'Sessions']])
-
-        # Aggregate resource usage and session data per Spark
-        spark_summary = filtered_logs.groupby('Spark ID')[resource_cols + ['Access ID']].agg({
-            **{col: 'sum' for col in resource_cols},
-            'Access ID': 'nunique'
-        }).reset_index()
-
-        # Calculate total and percent resource usage
-        spark_summary['Total Resources Used'] = spark_summary[resource_cols].sum(axis=1)
-        spark_summary['Percent Resources Used'] = (
-            spark_summary['Total Resources Used'] / len(resource_cols)
-        ).clip(upper=1) * 100
-        spark_summary.rename(columns={'Access ID': 'Sessions'}, inplace=True)
-
-        # Join Spark names into the summary
-        spark_summary = spark_summary.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
-        spark_summary.rename(columns={'Name': 'Spark Name'}, inplace=True)
+        st.dataframe(tables['User Sessions per Spark'])
 
         # Display Spark engagement summary
         st.subheader("Spark Engagement Summary")
-        st.dataframe(spark_summary[['Spark Name', 'Sessions', 'Percent Resources Used']])
+        paginated_table(tables['Spark Engagement Summary'], "resource_spark_summary", token)
 
         # Pie chart for total resource usage
         st.subheader("Overall Resource Usage Breakdown")
-        total_resource_usage = filtered_logs[resource_cols].sum()
+        total_resource_usage = tables['Overall Resource Usage']
 
         fig_pie = px.pie(
-            names=total_resource_usage.index,
-            values=total_resource_usage.values,
+            names=total_resource_usage['Resource Type'],
+            values=total_resource_usage['Interactions'],
             title="Distribution of Resource Interactions",
             color_discrete_sequence=px.colors.qualitative.Set3
         )
         st.plotly_chart(fig_pie)
 
-        # Aggregate and reshape resource usage by Spark
+        # Resource usage by Spark, reshaped for plotting
         st.subheader("Resource Usage per Spark")
-        resource_usage_data = filtered_logs.groupby('Spark ID')[resource_cols].sum().reset_index()
-        resource_usage_data = resource_usage_data.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
-        resource_usage_data.set_index('Name', inplace=True)
-        resource_usage_data = resource_usage_data[resource_cols]
-        resource_usage_reset = resource_usage_data.reset_index()
-
-        # Melt data for plotting
-        melted_data = resource_usage_reset.melt(id_vars='Name', var_name='Resource Type', value_name='Interactions')
+        melted_data = tables['Resource Usage per Spark']
 
         # Bubble chart to visualize resource interaction intensity per Spark
         st.markdown("### Bubble Chart: Resource Interactions per Spark")
@@ -417,17 +527,97 @@ def from_code_resource_type_report(access_logs, users, organizations, sparks):
         plt.ylabel('Resource Type')
         st.pyplot(fig_bubble)
 
+        # Export
+        export_org_report(data, 'resource_type', tables, org_id, start_date, end_date)
 
-def from_code_site_report(access_logs, users, organizations, sparks):
 
-    # Dropdown to select an organization
-    org_options = organizations[['Organization ID', 'Organization Name']].drop_duplicates()
-    org_name = st.selectbox("Select an Account (Organization)", org_options['Organization Name'], key="org_select_3")
-    org_id = org_options[org_options['Organization Name'] == org_name]['Organization ID'].values[0]
+# Function for computing the Site Engagement Report tables for one organization and date range
+def site_report_tables(data, org_id, start_date, end_date):
+    access_logs, users = data.access_logs, data.users
 
     # Filter users from the selected organization
     org_users = users[users['Organization ID'] == org_id]
 
+    # Filter logs for users in organization and within date range
+    filtered_logs = access_logs[
+        (access_logs['User ID'].isin(org_users['User ID'])) &
+        (access_logs['Timestamp'].dt.date >= start_date) &
+        (access_logs['Timestamp'].dt.date <= end_date)
+    ]
+
+    # Get users who were active during the filtered period
+    unique_users = org_users[org_users['User ID'].isin(filtered_logs['User ID'])]
+    user_list_df = unique_users[['First Name', 'Last Name', 'User Email']].copy()
+    user_list_df['Name'] = user_list_df['First Name'] + ' ' + user_list_df['Last Name']
+
+    # Count how many times each Spark was accessed
+    spark_access = filtered_logs['Spark ID'].value_counts().reset_index()
+    spark_access.columns = ['Spark ID', 'Access Count']
+    spark_access['Name'] = data.spark_name(spark_access['Spark ID'])
+
+    # Average percent of resources accessed per Spark
+    spark_resource_stats = filtered_logs.groupby('Spark ID').agg({
+        'Resources Accessed (%)': 'mean'
+    }).reset_index()
+    spark_resource_stats['Spark Name'] = data.spark_name(spark_resource_stats['Spark ID'])
+    spark_resource_stats.rename(columns={'Resources Accessed (%)': 'Avg % Resources Accessed'}, inplace=True)
+
+    # Count total sessions and distinct users per Spark
+    sessions_per_spark = filtered_logs.groupby('Spark ID').agg(
+        Total_Sessions=('Access ID', 'nunique'),
+        Total_Users=('User ID', 'nunique')
+    ).reset_index()
+    sessions_per_spark['Spark Name'] = data.spark_name(sessions_per_spark['Spark ID'])
+
+    # --- Per-Site Breakdown ---
+    # One grouped aggregation over all sites of the organization, so sites can be compared side by side
+    site_logs = filtered_logs[filtered_logs['Site ID'] >= 0]
+    site_activity = site_logs.groupby('Site ID').agg(
+        Total_Sessions=('Access ID', 'nunique'),
+        Active_Users=('User ID', 'nunique'),
+        Sparks_Accessed=('Spark ID', 'nunique'),
+        Avg_Session_Length=('Session Length (min)', 'mean'),
+        Avg_Resources_Accessed=('Resources Accessed (%)', 'mean')
+    )
+
+    # Start from every site with registered users so inactive sites still show up
+    site_users = org_users[org_users['Site ID'] >= 0].groupby('Site ID').size().rename('Registered_Users')
+    site_breakdown = data.sites.join(site_users, how='inner').join(site_activity)
+    count_cols = ['Total_Sessions', 'Active_Users', 'Sparks_Accessed']
+    site_breakdown[count_cols] = site_breakdown[count_cols].fillna(0).astype(int)
+
+    # Spark usage for every (site, Spark) pair in one pass; picking a site only slices the result
+    site_spark_usage = site_logs.groupby(['Site ID', 'Spark ID']).agg(
+        Sessions=('Access ID', 'nunique'),
+        Users=('User ID', 'nunique'),
+        Avg_Session_Length=('Session Length (min)', 'mean')
+    ).reset_index(level='Spark ID')
+    site_spark_usage['Spark Name'] = data.spark_name(site_spark_usage['Spark ID'])
+
+    # Average session lengths per Spark
+    avg_session_length = filtered_logs.groupby('Spark ID').agg(
+        Avg_Session_Length=('Session Length (min)', 'mean')
+    ).reset_index()
+    avg_session_length['Spark Name'] = data.spark_name(avg_session_length['Spark ID'])
+
+    return {
+        'User List': user_list_df[['Name', 'User Email']],
+        'Sparks Accessed': spark_access[['Name', 'Access Count']].rename(columns={'Name': 'Spark Name'}),
+        '% of Resources Accessed per Spark': spark_resource_stats[['Spark Name', 'Avg % Resources Accessed']],
+        'Number of User Sessions per Spark': sessions_per_spark[['Spark Name', 'Total_Sessions', 'Total_Users']],
+        'Per-Site Breakdown': site_breakdown,
+        'Site Spark Usage': site_spark_usage[['Spark Name', 'Sessions', 'Users', 'Avg_Session_Length']],
+        'Average Session Length per Spark': avg_session_length[['Spark Name', 'Avg_Session_Length']],
+    }
+
+def from_code_site_report(data):
+    access_logs, organizations = data.access_logs, data.organizations
+
+    # Dropdown to select an organization
+    org_id = st.selectbox("Select an Account (Organization)", organizations['Organization ID'].unique(),
+                          format_func=lambda i: data.org_names[i], key="org_select_3")
+    org_name = data.org_names[org_id]
+
     # Define available date range based on access logs
     min_date = access_logs['Timestamp'].min().date()
     max_date = access_logs['Timestamp'].max().date()
@@ -442,76 +632,82 @@ def from_code_site_report(access_logs, users, organizations, sparks):
         st.error("Start date must be before end date.")
         return
 
-    # Filter logs for users in organization and within date range
-    filtered_logs = access_logs[
-        (access_logs['User ID'].isin(org_users['User ID'])) &
-        (access_logs['Timestamp'].dt.date >= start_date) &
-        (access_logs['Timestamp'].dt.date <= end_date)
-    ]
-
-    # Get users who were active during the filtered period
-    unique_users = org_users[org_users['User ID'].isin(filtered_logs['User ID'])]
+    # Computed tables (from the report cache when this org and date range were seen before)
+    tables = cached_report_tables(data, 'site', org_id, start_date, end_date)
+    token = (data.fingerprint, org_id, start_date, end_date)
 
     # Display summary stats
     st.subheader("Site Summary")
-    st.markdown(f"- **Total Users (active in range)**: {unique_users['User ID'].nunique()}")
-    st.markdown(f"- **Total Sparks Accessed**: {filtered_logs['Spark ID'].nunique()}")
+    st.markdown(f"- **Total Users (active in range)**: {tables['User List'].shape[0]}")
+    st.markdown(f"- **Total Sparks Accessed**: {tables['Sparks Accessed'].shape[0]}")
 
     # Show list of users with names and emails
     st.subheader("User List")
-    user_list_df = unique_users[['First Name', 'Last Name', 'User Email']].copy()
-    user_list_df['Name'] = user_list_df['First Name'] + ' ' + user_list_df['Last Name']
-    st.dataframe(user_list_df[['Name', 'User Email']])
-
-    # Count how many times each Spark was accessed
-    spark_access = filtered_logs['Spark ID'].value_counts().reset_index()
-    spark_access.columns = ['Spark ID', 'Access Count']
-    spark_access = spark_access.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
+    paginated_table(tables['User List'], "site_users", token)
 
     # Show spark access counts
+    spark_access = tables['Sparks Accessed']
     st.subheader("Sparks Accessed")
-    st.dataframe(spark_access[['Name', 'Access Count']].rename(columns={'Name': 'Spark Name'}))
+    st.dataframe(spark_access)
 
     # Show average percent of resources accessed per Spark
     st.subheader("% of Resources Accessed per Spark")
-    spark_resource_stats = filtered_logs.groupby('Spark ID').agg({
-        'Resources Accessed (%)': 'mean'
-    }).reset_index()
-    spark_resource_stats = spark_resource_stats.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
-    spark_resource_stats.rename(columns={'Name': 'Spark Name', 'Resources Accessed (%)': 'Avg % Resources Accessed'}, inplace=True)
-    st.dataframe(spark_resource_stats[['Spark Name', 'Avg % Resources Accessed']])
+    st.dataframe(tables['% of Resources Accessed per Spark'])
 
     # Count total sessions and distinct users per Spark
     st.subheader("Number of User Sessions per Spark")
-    sessions_per_spark = filtered_logs.groupby('Spark ID').agg(
-        Total_Sessions=('Access ID', 'nunique'),
-        Total_Users=('User ID', 'nunique')
-    ).reset_index().merge(
-        sparks[['Spark ID', 'Name']],
-        on='Spark ID', how='left'
-    ).rename(columns={'Name': 'Spark Name'})
-    st.dataframe(sessions_per_spark[['Spark Name', 'Total_Sessions', 'Total_Users']])
+    st.dataframe(tables['Number of User Sessions per Spark'])
+
+    # --- Per-Site Breakdown ---
+    st.subheader("Per-Site Breakdown")
+    site_breakdown = tables['Per-Site Breakdown']
+
+    if not site_breakdown.empty:
+        st.dataframe(site_breakdown.reset_index(drop=True))
+
+        fig_sites = px.bar(
+            site_breakdown.sort_values(by='Total_Sessions', ascending=False),
+            x='Work Address',
+            y='Total_Sessions',
+            color='Active_Users',
+            title="Sessions per Site",
+            labels={'Total_Sessions': 'Sessions', 'Active_Users': 'Active Users'},
+            color_continuous_scale=["gold", "orange", "red"]
+        )
+        fig_sites.update_layout(xaxis_title='Site', yaxis_title='Sessions', height=500)
+        st.plotly_chart(fig_sites)
+
+        # Drill into one site by slicing the (site, Spark) table
+        site_spark_usage = tables['Site Spark Usage']
+        selected_site = st.selectbox("Drill into a Site", site_breakdown.index,
+                                     format_func=lambda site_id: data.sites.at[site_id, 'Work Address'],
+                                     key="site_select_1")
+        if selected_site in site_spark_usage.index:
+            st.dataframe(site_spark_usage.loc[[selected_site]]
+                         .sort_values(by='Sessions', ascending=False).reset_index(drop=True))
+        else:
+            st.info("No Spark activity at this site for the selected date range.")
+    else:
+        st.write("No site information available.")
 
     # Prepare data to visualize access over time
     st.subheader("Accesses Over Time")
-    access_over_time = filtered_logs.copy()
-    access_over_time['Date'] = access_over_time['Timestamp'].dt.date
-    access_counts = access_over_time.groupby('Date').size().reset_index(name='Access Count')
+    access_trend = data.daily_trend('org', org_id, start_date, end_date).rename(columns={'Daily': 'Access Count'})
 
-    # Line chart showing access trends by day
-    if not access_counts.empty:
-        st.line_chart(access_counts.set_index('Date'))
+    # Line chart showing access trends by day, smoothed with 7/28-day totals
+    if access_trend['Access Count'].sum() > 0:
+        show_trend(access_trend, 'Access Count')
     else:
         st.info("No access data available for the selected date range.")
 
     # Pie chart for distribution of Spark access
     st.subheader("Spark Access Distribution")
     if not spark_access.empty:
-        spark_access_pie = spark_access.groupby('Name')['Access Count'].sum().reset_index()
+        spark_access_pie = spark_access.groupby('Spark Name')['Access Count'].sum().reset_index()
 
         fig_pie = px.pie(
             spark_access_pie,
-            names='Name',
+            names='Spark Name',
             values='Access Count',
             title="Spark Access Distribution",
             color_discrete_sequence=px.colors.qualitative.Set3
@@ -522,13 +718,7 @@ def from_code_site_report(access_logs, users, organizations, sparks):
 
     # Bar chart of average session lengths per Spark
     st.subheader("Average Session Length per Spark (minutes)")
-    avg_session_length = filtered_logs.groupby('Spark ID').agg(
-        Avg_Session_Length=('Session Length (min)', 'mean')
-    ).reset_index()
-
-    avg_session_length = avg_session_length.merge(
-        sparks[['Spark ID', 'Name']], on='Spark ID', how='left'
-    ).rename(columns={'Name': 'Spark Name'})
+    avg_session_length = tables['Average Session Length per Spark']
 
     if not avg_session_length.empty:
         avg_session_length = avg_session_length.sort_values(by='Avg_Session_Length', ascending=False)
@@ -553,10 +743,72 @@ def from_code_site_report(access_logs, users, organizations, sparks):
     else:
         st.info("No session length data available for the selected date range.")
 
-def from_code_sparks_report(access_logs, users, organizations, sparks):
+    # Export
+    export_org_report(data, 'site', tables, org_id, start_date, end_date)
+
+# Function for computing the Sparks Report tables for one organization and date range
+def sparks_report_tables(data, org_id, start_date, end_date):
+    access_logs, users = data.access_logs, data.users
+
+    # Filter users belonging to the selected organization
+    org_users = users[users['Organization ID'] == org_id]
+
+    # Filter access logs by selected users and date range
+    filtered_logs = access_logs[
+        (access_logs['User ID'].isin(org_users['User ID'])) &
+        (access_logs['Timestamp'].dt.date >= start_date) &
+        (access_logs['Timestamp'].dt.date <= end_date)
+    ]
+
+    # Count unique sessions per Spark
+    sessions_per_spark = filtered_logs.groupby('Spark ID')['Access ID'].nunique().reset_index()
+    sessions_per_spark['Spark Name'] = data.spark_name(sessions_per_spark['Spark ID'])
+    sessions_per_spark.rename(columns={'Access ID': 'Sessions'}, inplace=True)
+
+    # Aggregate resource usage and calculate percent used
+    resource_cols = ['Viewed Slideshow', 'Downloaded Slideshow', 'Watched Tutorial Video', 'Downloaded AI Playbook']
+    spark_resource_usage = filtered_logs.groupby('Spark ID')[resource_cols].sum().reset_index()
+    spark_resource_usage['Total'] = spark_resource_usage[resource_cols].sum(axis=1)
+    spark_resource_usage['Percent Used'] = (
+        spark_resource_usage['Total'] /
+        (len(resource_cols) * filtered_logs.groupby('Spark ID').size())
+    ).fillna(0) * 100
+    spark_resource_usage['Spark Name'] = data.spark_name(spark_resource_usage['Spark ID'])
+
+    # Sites of the organization
+    associated_sites = data.site_list(org_users['Site ID']).to_frame().reset_index(drop=True)
+
+    # List of users and emails
+    user_list = org_users[['First Name', 'Last Name', 'User Email']].copy()
+    user_list['Name'] = user_list['First Name'] + ' ' + user_list['Last Name']
+
+    # Top Sparks by session count and engagement
+    top_sparks = sessions_per_spark.sort_values(by='Sessions', ascending=False).head(10)
+    top_sparks = top_sparks.merge(
+        spark_resource_usage[['Spark ID', 'Percent Used']],
+        on='Spark ID',
+        how='left'
+    )
+
+    # Overall access totals for each resource type
+    total_resources_accessed = filtered_logs[resource_cols].sum().sort_values(ascending=True)
+
+    return {
+        'Sessions per Spark': sessions_per_spark[['Spark Name', 'Sessions']],
+        'Percentage of Resources Accessed per Spark': spark_resource_usage[['Spark Name', 'Percent Used']],
+        'Sites': associated_sites,
+        'Users Associated': user_list[['Name', 'User Email']].rename(columns={'User Email': 'Email'}),
+        'Top Sparks': top_sparks[['Spark Name', 'Sessions', 'Percent Used']],
+        'Overall Resource Access Rates': total_resources_accessed.rename_axis('Resource Type').reset_index(name='Total Accesses'),
+    }
+
+def from_code_sparks_report(data):
+    access_logs, organizations, sparks = data.access_logs, data.organizations, data.sparks
 
     # Select organization to filter users and logs
-    selected_org = st.selectbox("Select Organization", organizations['Organization Name'].unique())
+    associated_org_id = st.selectbox("Select Organization", organizations['Organization ID'].unique(),
+                                     format_func=lambda i: data.org_names[i])
+    selected_org = data.org_names[associated_org_id]
 
     # Select date range for report
     start_date = st.date_input("Start Date", value=access_logs['Timestamp'].min().date(), key="start_date_input_9")
@@ -566,42 +818,18 @@ def from_code_sparks_report(access_logs, users, organizations, sparks):
     if start_date > end_date:
         st.error("Start date must be before end date.")
     else:
-        # Filter users belonging to the selected organization
-        org_users = users[users['Organization ID'].isin(
-            organizations[organizations['Organization Name'] == selected_org]['Organization ID']
-        )]
-
-        # Filter access logs by selected users and date range
-        filtered_logs = access_logs[
-            (access_logs['User ID'].isin(org_users['User ID'])) &
-            (access_logs['Timestamp'].dt.date >= start_date) &
-            (access_logs['Timestamp'].dt.date <= end_date)
-        ]
-
-        # Count unique sessions per Spark
-        sessions_per_spark = filtered_logs.groupby('Spark ID')['Access ID'].nunique().reset_index()
-        sessions_per_spark = sessions_per_spark.merge(sparks, left_on='Spark ID', right_on='Spark ID', how='left')
-        sessions_per_spark.rename(columns={'Access ID': 'Sessions', 'Name': 'Spark Name'}, inplace=True)
+        # Computed tables (from the report cache when this org and date range were seen before)
+        tables = cached_report_tables(data, 'sparks', associated_org_id, start_date, end_date)
+        token = (data.fingerprint, associated_org_id, start_date, end_date)
 
         st.subheader("Sessions per Spark")
-        st.dataframe(sessions_per_spark[['Spark Name', 'Sessions']])
-
-        # Aggregate resource usage and calculate percent used
-        resource_cols = ['Viewed Slideshow', 'Downloaded Slideshow', 'Watched Tutorial Video', 'Downloaded AI Playbook']
-        spark_resource_usage = filtered_logs.groupby('Spark ID')[resource_cols].sum().reset_index()
-        spark_resource_usage['Total'] = spark_resource_usage[resource_cols].sum(axis=1)
-        spark_resource_usage['Percent Used'] = (
-            spark_resource_usage['Total'] /
-            (len(resource_cols) * filtered_logs.groupby('Spark ID').size())
-        ).fillna(0) * 100
-        spark_resource_usage = spark_resource_usage.merge(sparks, left_on='Spark ID', right_on='Spark ID', how='left')
+        st.dataframe(tables['Sessions per Spark'])
 
         st.subheader("Percentage of Resources Accessed per Spark")
-        st.dataframe(spark_resource_usage[['Name', 'Percent Used']].rename(columns={'Name': 'Spark Name'}))
+        st.dataframe(tables['Percentage of Resources Accessed per Spark'])
 
         # Show associated organization ID and sites
-        associated_org_id = organizations[organizations['Organization Name'] == selected_org]['Organization ID'].values[0]
-        associated_sites = org_users['Work Address'].dropna().unique()
+        associated_sites = tables['Sites']['Work Address'].values
 
         st.subheader("Accounts and Sites Associated")
         st.markdown(f"**Organization:** {selected_org} (ID: {associated_org_id})")
@@ -609,18 +837,11 @@ def from_code_sparks_report(access_logs, users, organizations, sparks):
 
         # Show list of users and emails
         st.subheader("Users Associated")
-        user_list = org_users[['First Name', 'Last Name', 'User Email']].copy()
-        user_list['Name'] = user_list['First Name'] + ' ' + user_list['Last Name']
-        st.dataframe(user_list[['Name', 'User Email']].rename(columns={'User Email': 'Email'}))
+        paginated_table(tables['Users Associated'], "sparks_users", token)
 
         # Show top Sparks by session count and engagement
         st.subheader("Top Sparks by Sessions and Engagement")
-        top_sparks = sessions_per_spark.sort_values(by='Sessions', ascending=False).head(10)
-        top_sparks = top_sparks.merge(
-            spark_resource_usage[['Spark ID', 'Percent Used']],
-            on='Spark ID',
-            how='left'
-        )
+        top_sparks = tables['Top Sparks']
 
         if not top_sparks.empty:
             fig1 = px.scatter(
@@ -646,14 +867,14 @@ def from_code_sparks_report(access_logs, users, organizations, sparks):
 
         # Show overall access totals for each resource type
         st.subheader("Overall Resource Access Rates")
-        total_resources_accessed = filtered_logs[resource_cols].sum().sort_values(ascending=True)
+        total_resources_accessed = tables['Overall Resource Access Rates']
 
         if not total_resources_accessed.empty:
             fig2 = px.bar(
                 total_resources_accessed,
-                x=total_resources_accessed.index,
-                y=total_resources_accessed.values,
-                color=total_resources_accessed.index,
+                x='Resource Type',
+                y='Total Accesses',
+                color='Resource Type',
                 title="Overall Resource Access Rates"
             )
 
@@ -671,26 +892,124 @@ def from_code_sparks_report(access_logs, users, organizations, sparks):
 
         # Show sessions over time as a line chart
         st.subheader("Sessions Over Time")
-        sessions_over_time = filtered_logs.copy()
-        sessions_over_time['Date'] = sessions_over_time['Timestamp'].dt.date
-        sessions_by_date = sessions_over_time.groupby('Date').size().reset_index(name='Sessions')
+        sessions_trend = data.daily_trend('org', associated_org_id, start_date, end_date).rename(columns={'Daily': 'Sessions'})
 
-        if not sessions_by_date.empty:
-            st.line_chart(sessions_by_date.set_index('Date')['Sessions'])
+        if sessions_trend['Sessions'].sum() > 0:
+            show_trend(sessions_trend, 'Sessions')
         else:
             st.info("No session activity data for the selected period.")
 
+        # Trend of a single Spark across all organizations
+        st.subheader("Spark Trend (All Organizations)")
+        trend_spark_id = st.selectbox("Select a Spark", sparks['Spark ID'], format_func=lambda i: data.spark_names[i],
+                                      key="spark_trend_select")
+        spark_trend = data.daily_trend('spark', trend_spark_id, start_date, end_date).rename(columns={'Daily': 'Sessions'})
+
+        if spark_trend['Sessions'].sum() > 0:
+            show_trend(spark_trend, 'Sessions')
+        else:
+            st.info("No sessions of this Spark in the selected period.")
+
+        # Export
+        export_org_report(data, 'sparks', tables, associated_org_id, start_date, end_date)
+
+# Report name -> function computing its tables for (data, org_id, start_date, end_date)
+REPORT_TABLES = {
+    'account': account_report_tables,
+    'resource_type': resource_type_report_tables,
+    'site': site_report_tables,
+    'sparks': sparks_report_tables,
+}
+
+# Function for opening the on-disk report cache once per server process.
+# Location and size are set with REPORT_CACHE_DIR and REPORT_CACHE_MB (0 disables the disk cache).
+@st.cache_resource
+def get_report_cache():
+    max_mb = float(os.environ.get('REPORT_CACHE_MB', 512))
+    if max_mb <= 0:
+        return None
+    here = os.path.dirname(os.path.abspath(__file__))
+    directory = os.environ.get('REPORT_CACHE_DIR', os.path.join(here, '.report_cache'))
+    # The tables are computed by this file and report_data.py; changing either starts new cache entries
+    version = source_version(os.path.abspath(__file__), os.path.join(here, 'report_data.py'))
+    return ReportCache(directory, int(max_mb * 1024 * 1024), version)
+
+# Function for getting the tables of one report, org and date range: from memory,
+# then from the disk cache (shared by sessions and kept across restarts), computing them only on a miss.
+# `_data` is not hashed by Streamlit; the dataset fingerprint identifies it instead.
+@st.cache_data(show_spinner=False, max_entries=256)
+def _cached_report_tables(_data, fingerprint, report, org_id, start_date, end_date):
+    cache = get_report_cache()
+    key = (report, int(org_id), start_date.isoformat(), end_date.isoformat())
+    tables = cache.get(fingerprint, key) if cache is not None else None
+    if tables is None:
+        tables = REPORT_TABLES[report](_data, org_id, start_date, end_date)
+        if cache is not None:
+            cache.put(fingerprint, key, tables)
+    return tables
+
+def cached_report_tables(data, report, org_id, start_date, end_date):
+    return _cached_report_tables(data, data.fingerprint, report, org_id, start_date, end_date)
+
+# Function for iterating the tables of one report for every organization, labelled with the organization
+def all_org_report_tables(data, report, start_date, end_date):
+    for org_id in data.organizations['Organization ID'].unique():
+        tables = cached_report_tables(data, report, org_id, start_date, end_date)
+        yield label_tables(tables, **{'Organization ID': org_id, 'Organization': data.org_names[org_id]})
+
+# Function for the export controls under a report. `tables` are the tables on screen; `all_tables`
+# returns the chunks of the bulk option (e.g. one chunk per organization), which are streamed to the file.
+def export_section(key, file_name, tables, all_label, all_file_name, all_tables):
+    with st.expander("Export"):
+        col1, col2 = st.columns(2)
+        format_label = col1.selectbox("Format", list(EXPORT_FORMATS), key=f"{key}_export_format")
+        export_all = col2.checkbox(all_label, key=f"{key}_export_all")
+
+        if st.button("Prepare Export", key=f"{key}_export_prepare"):
+            with st.spinner("Exporting..."):
+                if export_all:
+                    content = export_report(all_tables(), format_label)
+                    file_name = all_file_name
+                else:
+                    content = export_report([tables], format_label)
+            _, extension, mime = EXPORT_FORMATS[format_label]
+            st.download_button("Download", content, file_name=f"{file_name}.{extension}", mime=mime,
+                               key=f"{key}_export_download", on_click="ignore")
+
+# Function for the export controls of the organization reports (shown org, or every org)
+def export_org_report(data, report, tables, org_id, start_date, end_date):
+    export_section(report, f"{report}_{safe_name(data.org_names[org_id])}_{start_date}_{end_date}", tables,
+                   "All organizations", f"{report}_all_organizations_{start_date}_{end_date}",
+                   lambda: all_org_report_tables(data, report, start_date, end_date))
+
 # --- Streamlit App Setup ---
 
 # Set page configuration
 st.set_page_config(page_title="Spark Engagement Reports", layout="wide")
 
-# Sidebar inputs for CSV uploads
-st.sidebar.header("Upload CSV Files")
-access_logs_file = st.sidebar.file_uploader("Upload access_logs.csv", type=["csv"])
-users_file = st.sidebar.file_uploader("Upload users.csv", type=["csv"])
-organizations_file = st.sidebar.file_uploader("Upload organizations.csv", type=["csv"])
-sparks_file = st.sidebar.file_uploader("Upload sparks.csv", type=["csv"])
+# A server-side dataset directory (REPORTS_DATA_DIR) is loaded once and shared read-only by all sessions
+shared_dir = os.environ.get('REPORTS_DATA_DIR')
+data_source = "Upload CSV Files"
+if shared_dir:
+    data_source = st.sidebar.radio("Data Source", ["Shared Dataset", "Upload CSV Files"])
+
+data = None
+if data_source == "Shared Dataset":
+    st.sidebar.caption(f"Using the dataset in `{shared_dir}`.")
+    # A shallow per-session copy: changes a report makes to the tables never reach other sessions
+    data = load_shared_data(shared_dir, dataset_modified(shared_dir)).session_view()
+else:
+    # Sidebar inputs for CSV uploads
+    st.sidebar.header("Upload CSV Files")
+    access_logs_file = st.sidebar.file_uploader("Upload access_logs.csv", type=["csv"])
+    users_file = st.sidebar.file_uploader("Upload users.csv", type=["csv"])
+    organizations_file = st.sidebar.file_uploader("Upload organizations.csv", type=["csv"])
+    sparks_file = st.sidebar.file_uploader("Upload sparks.csv", type=["csv"])
+
+    if access_logs_file and users_file and organizations_file and sparks_file:
+        # Parse the uploads once and build the shared indexes (site IDs, ...)
+        data = load_data(access_logs_file.getvalue(), users_file.getvalue(),
+                         organizations_file.getvalue(), sparks_file.getvalue())
 
 # Create tabs for different report types
 tabs = st.tabs([
@@ -701,35 +1020,27 @@ tabs = st.tabs([
     "Sparks Report"
 ])
 
-# Run reports if all files are uploaded
-if access_logs_file and users_file and organizations_file and sparks_file:
-    access_logs = pd.read_csv(access_logs_file)
-    users = pd.read_csv(users_file)
-    organizations = pd.read_csv(organizations_file)
-    sparks = pd.read_csv(sparks_file)
-
-    # Convert timestamp column to datetime
-    access_logs['Timestamp'] = pd.to_datetime(access_logs['Timestamp'])
-
+# Run reports once a dataset is available
+if data is not None:
     with tabs[0]:
         st.title("Account-Level Spark Engagement Report")
-        from_code_account_report(access_logs, users, organizations, sparks)
+        from_code_account_report(data)
 
     with tabs[1]:
         st.title("Individual User Spark Engagement Report")
-        from_code_individual_report(access_logs, users, organizations, sparks)
+        from_code_individual_report(data)
 
     with tabs[2]:
         st.title("Resource Type Usage Report")
-        from_code_resource_type_report(access_logs, users, organizations, sparks)
+        from_code_resource_type_report(data)
 
     with tabs[3]:
         st.title("Site Engagement Report Generator")
-        from_code_site_report(access_logs, users, organizations, sparks)
+        from_code_site_report(data)
         
     with tabs[4]:
         st.title("Sparks Report Generator")
-        from_code_sparks_report(access_logs, users, organizations, sparks)
+        from_code_sparks_report(data)
 else:
     st.warning("Please upload all required files (access_logs, users, organizations, sparks) to see reports.")
     
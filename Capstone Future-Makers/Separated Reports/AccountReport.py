@@ -2,6 +2,12 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
+import os
+import sys
+
+# Shared helpers of the combined app in the parent folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from report_data import lookup_array
 
 st.set_page_config(page_title="Account Engagement Report", layout="wide")
 st.title("Account-Level Spark Engagement Report")
@@ -21,10 +27,15 @@ if access_logs_file and users_file and organizations_file:
     organizations = pd.read_csv(organizations_file)
     access_logs['Timestamp'] = pd.to_datetime(access_logs['Timestamp'])
 
+    # Names keyed by ID (see report_data.lookup_array)
+    spark_names = lookup_array(sparks['Spark ID'], sparks['Name'], size=access_logs['Spark ID'].max() + 1)
+    org_names = lookup_array(organizations['Organization ID'], organizations['Organization Name'],
+                             size=users['Organization ID'].max() + 1)
+
     # Select an organization
-    org_options = organizations[['Organization ID', 'Organization Name']].drop_duplicates()
-    org_name = st.selectbox("Select an Account (Organization)", org_options['Organization Name'])
-    org_id = org_options[org_options['Organization Name'] == org_name]['Organization ID'].values[0]
+    org_id = st.selectbox("Select an Account (Organization)", organizations['Organization ID'].unique(),
+                          format_func=lambda i: org_names[i])
+    org_name = org_names[org_id]
 
     # Filter users in selected organization
     org_users = users[users['Organization ID'] == org_id]
@@ -81,7 +92,7 @@ if access_logs_file and users_file and organizations_file:
 
         # --- Sparks Accessed in Date Range ---
         accessed_sparks = filtered_logs['Spark ID'].dropna().unique()
-        accessed_spark_names = sparks[sparks['Spark ID'].isin(accessed_sparks)][['Spark ID', 'Name']].rename(columns={'Name': 'Spark Name'})
+        accessed_spark_names = pd.DataFrame({'Spark ID': accessed_sparks, 'Spark Name': spark_names.take(accessed_sparks)}).dropna()
 
         st.subheader("Sparks Accessed in Date Range")
         if not accessed_spark_names.empty:
@@ -95,8 +106,7 @@ if access_logs_file and users_file and organizations_file:
         spark_resource_usage['Percent Resources Accessed'] = (
             spark_resource_usage['Resources Accessed'] / len(resource_cols)
         ) * 100
-        spark_resource_usage = spark_resource_usage.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
-        spark_resource_usage.rename(columns={'Name': 'Spark Name'}, inplace=True)
+        spark_resource_usage['Spark Name'] = spark_names.take(spark_resource_usage['Spark ID'])
 
         st.subheader("Percent of Resources Accessed Per Spark")
         st.dataframe(spark_resource_usage[['Spark Name', 'Percent Resources Accessed']])
@@ -104,8 +114,7 @@ if access_logs_file and users_file and organizations_file:
         # --- User Sessions per Spark ---
         spark_sessions = filtered_logs.groupby('Spark ID')['Access ID'].nunique().reset_index()
         spark_sessions.rename(columns={'Access ID': 'User Sessions'}, inplace=True)
-        spark_sessions = spark_sessions.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
-        spark_sessions.rename(columns={'Name': 'Spark Name'}, inplace=True)
+        spark_sessions['Spark Name'] = spark_names.take(spark_sessions['Spark ID'])
 
         st.subheader("Number of User Sessions per Spark")
         st.dataframe(spark_sessions[['Spark Name', 'User Sessions']])
@@ -115,8 +124,7 @@ if access_logs_file and users_file and organizations_file:
         spark_summary['Total Resources Used'] = spark_summary[resource_cols].sum(axis=1)
         spark_summary['Percent Resources Used'] = ( spark_summary['Total Resources Used'] / len(resource_cols)).clip(upper=1) * 100
         spark_summary.rename(columns={'Access ID': 'User Sessions'}, inplace=True)
-        spark_summary = spark_summary.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
-        spark_summary.rename(columns={'Name': 'Spark Name'}, inplace=True)
+        spark_summary['Spark Name'] = spark_names.take(spark_summary['Spark ID'])
         st.subheader("Spark Engagement Summary")
         st.dataframe(spark_summary[['Spark Name', 'User Sessions', 'Percent Resources Used', 'Timestamp']])
 
@@ -138,7 +146,7 @@ if access_logs_file and users_file and organizations_file:
 
         # --- Graph 2: Session Length Distribution per Spark ---
         session_lengths = filtered_logs[['Spark ID', 'Session Length (min)']].dropna()
-        session_lengths = session_lengths.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
+        session_lengths['Name'] = spark_names.take(session_lengths['Spark ID'])
 
         fig2 = px.box(
             session_lengths,
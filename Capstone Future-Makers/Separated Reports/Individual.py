@@ -1,7 +1,14 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 from datetime import datetime
+import os
+import sys
+
+# Shared helpers of the combined app in the parent folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from report_data import lookup_array
 
 st.set_page_config(page_title="Individual User Report", layout="wide")
 st.title("Individual User Spark Engagement Report")
@@ -21,12 +28,16 @@ if access_logs_file and users_file and organizations_file:
     organizations = pd.read_csv(organizations_file)
     access_logs['Timestamp'] = pd.to_datetime(access_logs['Timestamp'])
 
-    # Select a user
-    users['Full Name'] = users['First Name'] + ' ' + users['Last Name']
-    selected_user_name = st.selectbox("Select a User", users['Full Name'].unique())
+    # Names and row positions keyed by ID (see report_data.lookup_array)
+    org_names = lookup_array(organizations['Organization ID'], organizations['Organization Name'],
+                             size=users['Organization ID'].max() + 1)
+    user_names = lookup_array(users['User ID'], users['First Name'] + ' ' + users['Last Name'])
+    user_rows = lookup_array(users['User ID'], np.arange(len(users)), fill=-1)
 
-    selected_user = users[users['Full Name'] == selected_user_name].iloc[0]
-    user_id = selected_user['User ID']
+    # Select a user
+    user_id = st.selectbox("Select a User", users['User ID'], format_func=lambda i: user_names[i])
+    selected_user_name = user_names[user_id]
+    selected_user = users.iloc[user_rows[user_id]]
 
     start_date = st.date_input("Start Date", value=access_logs['Timestamp'].min().date())
     end_date = st.date_input("End Date", value=access_logs['Timestamp'].max().date())
@@ -42,7 +53,7 @@ if access_logs_file and users_file and organizations_file:
 
         # Display basic info
         org_id = selected_user['Organization ID']
-        organization_name = organizations.loc[organizations['Organization ID'] == org_id, 'Organization Name'].values[0]
+        organization_name = org_names[org_id]
         site = selected_user['Work Address']
 
         st.subheader("User Info")
@@ -4,6 +4,12 @@ from datetime import datetime
 import plotly.express as px
 import seaborn as sns
 import matplotlib.pyplot as plt
+import os
+import sys
+
+# Shared helpers of the combined app in the parent folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from report_data import lookup_array
 
 st.set_page_config(page_title="Account Engagement Report", layout="wide")
 st.title("Account-Level Spark Engagement Report")
@@ -23,10 +29,15 @@ if access_logs_file and users_file and organizations_file:
     organizations = pd.read_csv(organizations_file)
     access_logs['Timestamp'] = pd.to_datetime(access_logs['Timestamp'])
 
+    # Names keyed by ID (see report_data.lookup_array)
+    spark_names = lookup_array(sparks['Spark ID'], sparks['Name'], size=access_logs['Spark ID'].max() + 1)
+    org_names = lookup_array(organizations['Organization ID'], organizations['Organization Name'],
+                             size=users['Organization ID'].max() + 1)
+
     # Select an organization
-    org_options = organizations[['Organization ID', 'Organization Name']].drop_duplicates()
-    org_name = st.selectbox("Select an Account (Organization)", org_options['Organization Name'])
-    org_id = org_options[org_options['Organization Name'] == org_name]['Organization ID'].values[0]
+    org_id = st.selectbox("Select an Account (Organization)", organizations['Organization ID'].unique(),
+                          format_func=lambda i: org_names[i])
+    org_name = org_names[org_id]
 
     # Filter users in selected organization
     org_users = users[users['Organization ID'] == org_id]
@@ -75,8 +86,7 @@ if access_logs_file and users_file and organizations_file:
         # --- User Sessions per Spark ---
         user_sessions_per_spark = filtered_logs.groupby('Spark ID')['User ID'].nunique().reset_index()
         user_sessions_per_spark.rename(columns={'User ID': 'Sessions'}, inplace=True)
-        user_sessions_per_spark = user_sessions_per_spark.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
-        user_sessions_per_spark.rename(columns={'Name': 'Spark Name'}, inplace=True)
+        user_sessions_per_spark['Spark Name'] = spark_names.take(user_sessions_per_spark['Spark ID'])
 
         st.subheader("User Sessions per Spark")
         st.dataframe(user_sessions_per_spark[['Spark Name', 'Sessions']])
@@ -92,8 +102,7 @@ if access_logs_file and users_file and organizations_file:
         ).clip(upper=1) * 100
         spark_summary.rename(columns={'Access ID': 'Sessions'}, inplace=True)
 
-        spark_summary = spark_summary.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
-        spark_summary.rename(columns={'Name': 'Spark Name'}, inplace=True)
+        spark_summary['Spark Name'] = spark_names.take(spark_summary['Spark ID'])
 
         st.subheader("Spark Engagement Summary")
         st.dataframe(spark_summary[['Spark Name', 'Sessions', 'Percent Resources Used']])
@@ -119,7 +128,7 @@ if access_logs_file and users_file and organizations_file:
 
         # Prepare data
         resource_usage_data = filtered_logs.groupby('Spark ID')[resource_cols].sum().reset_index()
-        resource_usage_data = resource_usage_data.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
+        resource_usage_data['Name'] = spark_names.take(resource_usage_data['Spark ID'])
         resource_usage_data.set_index('Name', inplace=True)
         resource_usage_data = resource_usage_data[resource_cols]
 
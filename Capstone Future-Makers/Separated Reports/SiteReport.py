@@ -2,6 +2,12 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
+import os
+import sys
+
+# Shared helpers of the combined app in the parent folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from report_data import lookup_array
 
 st.set_page_config(page_title="Site Report", layout="wide")
 st.title("Site Engagement Report Generator")
@@ -22,15 +28,20 @@ if access_logs_file and users_file and organizations_file:
     # Convert timestamp
     access_logs['Timestamp'] = pd.to_datetime(access_logs['Timestamp'])
 
+    # Names keyed by ID (see report_data.lookup_array)
+    spark_names = lookup_array(sparks['Spark ID'], sparks['Name'], size=access_logs['Spark ID'].max() + 1)
+    org_names = lookup_array(organizations['Organization ID'], organizations['Organization Name'],
+                             size=users['Organization ID'].max() + 1)
+
     # Select organization & date range
-    selected_org = st.selectbox("Select Organization", organizations['Organization Name'].unique())
+    org_id = st.selectbox("Select Organization", organizations['Organization ID'].unique(),
+                          format_func=lambda i: org_names[i])
     start_date = st.date_input("Start Date", value=access_logs['Timestamp'].min().date())
     end_date = st.date_input("End Date", value=access_logs['Timestamp'].max().date())
 
     if start_date > end_date:
         st.error("Start date must be before end date.")
     else:
-        org_id = organizations[organizations['Organization Name'] == selected_org]['Organization ID'].values[0]
         org_users = users[users['Organization ID'] == org_id]
         filtered_logs = access_logs[
             (access_logs['User ID'].isin(org_users['User ID'])) &
@@ -54,7 +65,7 @@ if access_logs_file and users_file and organizations_file:
         ### Sparks Accessed
         spark_access = filtered_logs['Spark ID'].value_counts().reset_index()
         spark_access.columns = ['Spark ID', 'Access Count']
-        spark_access = spark_access.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
+        spark_access['Name'] = spark_names.take(spark_access['Spark ID'])
 
         st.subheader(" Sparks Accessed")
         st.dataframe(spark_access[['Name', 'Access Count']].rename(columns={'Name': 'Spark Name'}))
@@ -64,8 +75,8 @@ if access_logs_file and users_file and organizations_file:
         spark_resource_stats = filtered_logs.groupby('Spark ID').agg({
             'Resources Accessed (%)': 'mean'
         }).reset_index()
-        spark_resource_stats = spark_resource_stats.merge(sparks[['Spark ID', 'Name']], on='Spark ID', how='left')
-        spark_resource_stats.rename(columns={'Name': 'Spark Name', 'Resources Accessed (%)': 'Avg % Resources Accessed'}, inplace=True)
+        spark_resource_stats['Spark Name'] = spark_names.take(spark_resource_stats['Spark ID'])
+        spark_resource_stats.rename(columns={'Resources Accessed (%)': 'Avg % Resources Accessed'}, inplace=True)
         st.dataframe(spark_resource_stats[['Spark Name', 'Avg % Resources Accessed']])
 
         ### Sessions per Spark
@@ -73,10 +84,8 @@ if access_logs_file and users_file and organizations_file:
         sessions_per_spark = filtered_logs.groupby('Spark ID').agg(
             Total_Sessions=('Access ID', 'nunique'),
             Total_Users=('User ID', 'nunique')
-        ).reset_index().merge(
-            sparks[['Spark ID', 'Name']],
-            on='Spark ID', how='left'
-        ).rename(columns={'Name': 'Spark Name'})
+        ).reset_index()
+        sessions_per_spark['Spark Name'] = spark_names.take(sessions_per_spark['Spark ID'])
         st.dataframe(sessions_per_spark[['Spark Name', 'Total_Sessions', 'Total_Users']])
 
 
@@ -118,9 +127,7 @@ if access_logs_file and users_file and organizations_file:
             Avg_Session_Length=('Session Length (min)', 'mean')
         ).reset_index()
 
-        avg_session_length = avg_session_length.merge(
-            sparks[['Spark ID', 'Name']], on='Spark ID', how='left'
-        ).rename(columns={'Name': 'Spark Name'})
+        avg_session_length['Spark Name'] = spark_names.take(avg_session_length['Spark ID'])
 
         if not avg_session_length.empty:
             avg_session_length = avg_session_length.sort_values(by='Avg_Session_Length', ascending=False)
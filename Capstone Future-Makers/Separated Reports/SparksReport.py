@@ -2,6 +2,12 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
+import os
+import sys
+
+# Shared helpers of the combined app in the parent folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from report_data import lookup_array
 
 st.set_page_config(page_title="Spark Engagement Report", layout="wide")
 st.title("Spark Engagement Report Generator")
@@ -23,8 +29,15 @@ if access_logs_file and users_file and sparks_file and organizations_file:
     # Convert Timestamp to datetime
     access_logs['Timestamp'] = pd.to_datetime(access_logs['Timestamp'])
 
+    # Names keyed by ID (see report_data.lookup_array)
+    spark_names = lookup_array(sparks['Spark ID'], sparks['Name'], size=access_logs['Spark ID'].max() + 1)
+    org_names = lookup_array(organizations['Organization ID'], organizations['Organization Name'],
+                             size=users['Organization ID'].max() + 1)
+
     # Ask user to select organization and date range
-    selected_org = st.selectbox("Select Organization", organizations['Organization Name'].unique())
+    associated_org_id = st.selectbox("Select Organization", organizations['Organization ID'].unique(),
+                                     format_func=lambda i: org_names[i])
+    selected_org = org_names[associated_org_id]
     start_date = st.date_input("Start Date", value=access_logs['Timestamp'].min().date())
     end_date = st.date_input("End Date", value=access_logs['Timestamp'].max().date())
 
@@ -32,7 +45,7 @@ if access_logs_file and users_file and sparks_file and organizations_file:
         st.error("Start date must be before end date.")
     else:
         # Filter by date and organization
-        org_users = users[users['Organization ID'].isin(organizations[organizations['Organization Name'] == selected_org]['Organization ID'])]
+        org_users = users[users['Organization ID'] == associated_org_id]
         filtered_logs = access_logs[
             (access_logs['User ID'].isin(org_users['User ID'])) &
             (access_logs['Timestamp'].dt.date >= start_date) &
@@ -41,8 +54,8 @@ if access_logs_file and users_file and sparks_file and organizations_file:
 
         # Sessions per Spark
         sessions_per_spark = filtered_logs.groupby('Spark ID')['Access ID'].nunique().reset_index()
-        sessions_per_spark = sessions_per_spark.merge(sparks, left_on='Spark ID', right_on='Spark ID', how='left')
-        sessions_per_spark.rename(columns={'Access ID': 'Sessions', 'Name': 'Spark Name'}, inplace=True)
+        sessions_per_spark['Spark Name'] = spark_names.take(sessions_per_spark['Spark ID'])
+        sessions_per_spark.rename(columns={'Access ID': 'Sessions'}, inplace=True)
         st.subheader("Sessions per Spark")
         st.dataframe(sessions_per_spark[['Spark Name', 'Sessions']])
 
@@ -51,12 +64,11 @@ if access_logs_file and users_file and sparks_file and organizations_file:
         spark_resource_usage = filtered_logs.groupby('Spark ID')[resource_cols].sum().reset_index()
         spark_resource_usage['Total'] = spark_resource_usage[resource_cols].sum(axis=1)
         spark_resource_usage['Percent Used'] = (spark_resource_usage['Total'] / (len(resource_cols) * filtered_logs.groupby('Spark ID').size())).fillna(0) * 100
-        spark_resource_usage = spark_resource_usage.merge(sparks, left_on='Spark ID', right_on='Spark ID', how='left')
+        spark_resource_usage['Spark Name'] = spark_names.take(spark_resource_usage['Spark ID'])
         st.subheader("Percentage of Resources Accessed per Spark")
-        st.dataframe(spark_resource_usage[['Name', 'Percent Used']].rename(columns={'Name': 'Spark Name'}))
+        st.dataframe(spark_resource_usage[['Spark Name', 'Percent Used']])
 
         # Accounts and Sites associated
-        associated_org_id = organizations[organizations['Organization Name'] == selected_org]['Organization ID'].values[0]
         associated_sites = org_users['Work Address'].dropna().unique()
         st.subheader("Accounts and Sites Associated")
         st.markdown(f"**Organization:** {selected_org} (ID: {associated_org_id})")
@@ -0,0 +1,130 @@
+# Purpose: Disk-backed cache of computed report tables for Combined.py.
+#          Report tables only depend on (dataset, report, organization, date range), so results computed once
+#          are kept on disk and survive server restarts and new user sessions. Entries also depend on a version
+#          of the code computing them, so a deploy that changes a report does not keep serving old tables.
+
+#  Libraries
+import os
+import pickle
+import hashlib
+import tempfile
+
+
+# Function for a version of the code computing the cached tables: a hash of the given source files,
+# so any change to them starts new cache entries (old ones are evicted as least recently used)
+def source_version(*paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+# Class storing report tables as pickle files, grouped by dataset fingerprint
+class ReportCache:
+    """Size-bounded, least-recently-used cache of report tables on disk.
+    Parameters
+    ------------
+    directory : str
+      Folder holding the cache. Every dataset gets its own sub folder named
+      after its fingerprint, so entries of other uploads never match.
+    max_bytes : int
+      Total size of the cache files. When a new entry pushes the cache over
+      this size, the least recently used files are deleted until it is back
+      under 90% of it.
+    version : str
+      Version of the code computing the tables (see source_version). It is
+      part of every entry's key, so entries of other versions never match.
+    """
+
+    def __init__(self, directory, max_bytes, version=''):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version
+        os.makedirs(directory, exist_ok=True)
+        # Running total of the entry sizes, so a put only scans the folder when the cache is over the limit
+        self.size = sum(size for _, size, _ in self._entries())
+
+    def _path(self, fingerprint, key):
+        # File of one entry; the code version and key (report, org, dates, ...) are hashed into a file name
+        name = hashlib.sha256(repr((self.version, key)).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, fingerprint, name + '.pkl')
+
+    def get(self, fingerprint, key):
+        # Return the cached tables, or None if the entry is missing or unreadable
+        path = self._path(fingerprint, key)
+        try:
+            with open(path, 'rb') as f:
+                tables = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A corrupt or incompatible entry is treated as a miss and recomputed
+            self._remove(path)
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return tables
+
+    def put(self, fingerprint, key, tables):
+        # Write the tables atomically (temp file + rename) so readers never see a partial file
+        path = self._path(fingerprint, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self.size += os.path.getsize(path) - old_size
+        except OSError:
+            self._remove(tmp_path)
+            return
+        if self.size > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        # (last use, size, path) of every cache file
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.pkl'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        # Delete the least recently used files until the cache fills at most 90% of max_bytes, so the folder
+        # is not scanned again on every following put. The scan also corrects the running size for entries
+        # written or removed by other server processes.
+        entries = self._entries()
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self.size <= 0.9 * self.max_bytes:
+                break
+            self._remove(path)
+            self.size -= size
+
+        # Drop folders of datasets that no longer have entries
+        for name in os.listdir(self.directory):
+            folder = os.path.join(self.directory, name)
+            if os.path.isdir(folder) and not os.listdir(folder):
+                try:
+                    os.rmdir(folder)
+                except OSError:
+                    pass
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,295 @@
+# Purpose: Loading and indexing of the uploaded CSV files used by the Spark Engagement Reports in Combined.py.
+#          Everything that only depends on the data (not on the dropdowns) is built here once per upload.
+
+#  Libraries
+import io
+import os
+import copy
+import hashlib
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+# Sessions share one ReportData through shallow copies (see ReportData.session_view), which relies on
+# pandas copy-on-write. It is always on from pandas 3.0 and has to be switched on for older versions.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+
+# Class holding the four uploaded tables plus the indexes built from them
+class ReportData:
+    """Uploaded tables and the indexes the reports share.
+    Attributes
+    -----------
+    access_logs, users, organizations, sparks : DataFrame
+      The uploaded CSV files. `access_logs['Timestamp']` is parsed to
+      datetime, and both `users` and `access_logs` carry a `Site ID` column.
+      `access_logs` also carries the `Organization ID` of the user.
+    sites : DataFrame
+      One row per distinct work address, indexed by `Site ID`
+      (0..n_sites-1, in address order). Users without an address have
+      `Site ID` -1.
+    spark_names, org_names : 1d-array
+      Names keyed by Spark ID / Organization ID (`spark_names[3]` is the
+      name of Spark 3); IDs missing from the table map to None.
+    user_rows, user_sites, user_orgs, user_names : 1d-array
+      Row position in `users`, Site ID, Organization ID and full name
+      keyed by User ID.
+    days : DatetimeIndex
+      Every calendar day from the first to the last access.
+    org_cumulative, spark_cumulative : 2d-array, shape = [max_id + 1, n_days + 1]
+      Running totals of accesses per day, one row per Organization ID /
+      Spark ID. Column 0 is all zeros, so the accesses between day
+      `i` and day `j` (inclusive) are `row[j + 1] - row[i]`.
+    user_summary : DataFrame
+      One row per user (indexed by `User ID`) over the whole log: name,
+      organization, session count, total and mean session length, first
+      and last access, and per-activity counts (`<activity>`) and minutes
+      (`<activity> (min)`). Users without accesses have zero counts.
+    user_log_rows : dict
+      Row positions in `access_logs` of every User ID that has accesses.
+    fingerprint : str
+      Hash of the uploaded files. Identical uploads share the fingerprint,
+      so it keys results (e.g. the report cache) that depend on the data.
+    """
+
+    def __init__(self, access_logs, users, organizations, sparks, fingerprint=None):
+        self.access_logs = access_logs
+        self.users = users
+        self.organizations = organizations
+        self.sparks = sparks
+        self.fingerprint = fingerprint
+        self._build_site_index()
+        self._build_lookups()
+        self._build_daily_counts()
+        self._build_user_summary()
+
+    def _build_site_index(self):
+        # Normalize work addresses into integer site IDs (missing addresses become -1)
+        site_ids, addresses = pd.factorize(self.users['Work Address'], sort=True)
+        self.users['Site ID'] = site_ids
+        self.sites = pd.DataFrame({'Work Address': addresses}, index=pd.RangeIndex(len(addresses), name='Site ID'))
+
+    def _build_lookups(self):
+        # Dimension tables as dense arrays keyed by ID, so resolving IDs is a take instead of a merge
+        self.spark_names = lookup_array(self.sparks['Spark ID'], self.sparks['Name'],
+                                        size=self.access_logs['Spark ID'].max() + 1)
+        self.org_names = lookup_array(self.organizations['Organization ID'], self.organizations['Organization Name'],
+                                      size=self.users['Organization ID'].max() + 1)
+
+        # User attributes keyed by User ID (-1 / None for IDs that only appear in the log)
+        n_user_ids = max(self.users['User ID'].max(), self.access_logs['User ID'].max()) + 1
+        self.user_rows = lookup_array(self.users['User ID'], np.arange(len(self.users)), fill=-1, size=n_user_ids)
+        self.user_sites = lookup_array(self.users['User ID'], self.users['Site ID'], fill=-1, size=n_user_ids)
+        self.user_orgs = lookup_array(self.users['User ID'], self.users['Organization ID'], fill=-1, size=n_user_ids)
+        self.user_names = lookup_array(self.users['User ID'], self.users['First Name'] + ' ' + self.users['Last Name'],
+                                       size=n_user_ids)
+
+        # Map every access to the site and organization of the user who made it
+        log_users = self.access_logs['User ID'].to_numpy()
+        self.access_logs['Site ID'] = self.user_sites.take(log_users)
+        self.access_logs['Organization ID'] = self.user_orgs.take(log_users)
+
+    def _build_daily_counts(self):
+        # Day number of every access, counted from the first day in the log
+        day_stamps = self.access_logs['Timestamp'].dt.normalize()
+        self.days = pd.date_range(day_stamps.min(), day_stamps.max(), freq='D')
+        day_index = (day_stamps - self.days[0]).dt.days.to_numpy()
+
+        # Per-day access counts for every organization and Spark, stored as running totals
+        self.org_cumulative = self._cumulative_counts(self.access_logs['Organization ID'].to_numpy(), day_index,
+                                                       self.organizations['Organization ID'].max())
+        self.spark_cumulative = self._cumulative_counts(self.access_logs['Spark ID'].to_numpy(), day_index,
+                                                         self.sparks['Spark ID'].max())
+
+    def _cumulative_counts(self, ids, day_index, max_id):
+        # Count accesses per (id, day) with one bincount, then take running totals along the days
+        n_days = len(self.days)
+        n_rows = int(max(max_id, ids.max(initial=0))) + 1
+        known = ids >= 0
+        counts = np.bincount(ids[known] * n_days + day_index[known], minlength=n_rows * n_days)
+        cumulative = np.zeros((n_rows, n_days + 1), dtype=np.int64)
+        np.cumsum(counts.reshape(n_rows, n_days), axis=1, out=cumulative[:, 1:])
+        return cumulative
+
+    def daily_trend(self, level, item_id, start_date, end_date):
+        # Return daily accesses, 7/28-day rolling totals and the week-over-week change of the 7-day total
+        # for one organization (level='org') or Spark (level='spark'). Windows look back past start_date.
+        cumulative = self.org_cumulative if level == 'org' else self.spark_cumulative
+        first = max((pd.Timestamp(start_date) - self.days[0]).days, 0)
+        last = min((pd.Timestamp(end_date) - self.days[0]).days, len(self.days) - 1)
+        if item_id >= len(cumulative) or first > last:
+            return pd.DataFrame(columns=['Daily', '7-Day Total', '28-Day Total', 'Week-over-Week Change'],
+                                index=pd.DatetimeIndex([], name='Date'))
+
+        running = cumulative[int(item_id)]
+        ends = np.arange(first, last + 1) + 1
+
+        def window_total(window, offset=0):
+            # Accesses in the `window` days ending `offset` days before each day of the range
+            return running[np.maximum(ends - offset, 0)] - running[np.maximum(ends - offset - window, 0)]
+
+        weekly = window_total(7)
+        return pd.DataFrame({
+            'Daily': window_total(1),
+            '7-Day Total': weekly,
+            '28-Day Total': window_total(28),
+            'Week-over-Week Change': weekly - window_total(7, offset=7),
+        }, index=self.days[first:last + 1].rename('Date'))
+
+    def _build_user_summary(self):
+        logs = self.access_logs
+        minutes = logs['Session Length (min)']
+
+        # Minutes spent per activity: the session length where the activity was performed, else 0
+        performed = logs[ACTIVITIES].astype(bool)
+        activity_minutes = performed.mul(minutes, axis=0).add_suffix(' (min)')
+        columns = pd.concat([logs[['User ID', 'Access ID', 'Timestamp']], minutes, performed, activity_minutes], axis=1)
+
+        # One grouped pass for every user
+        grouped = columns.groupby('User ID')
+        summary = grouped.agg(**{
+            'Sessions': ('Access ID', 'nunique'),
+            'Total Session Length (min)': ('Session Length (min)', 'sum'),
+            'Mean Session Length (min)': ('Session Length (min)', 'mean'),
+            'First Seen': ('Timestamp', 'min'),
+            'Last Seen': ('Timestamp', 'max'),
+            **{col: (col, 'sum') for col in list(performed.columns) + list(activity_minutes.columns)},
+        })
+        self.user_log_rows = grouped.indices
+
+        # Every registered user gets a row; users without accesses have zero counts
+        summary = summary.reindex(self.users['User ID'])
+        count_cols = ['Sessions', 'Total Session Length (min)'] + list(performed.columns) + list(activity_minutes.columns)
+        summary[count_cols] = summary[count_cols].fillna(0).astype(minutes.dtype)
+        summary['Sessions'] = summary['Sessions'].astype(int)
+        summary[list(performed.columns)] = summary[list(performed.columns)].astype(int)
+        summary.insert(0, 'Name', self.user_names.take(summary.index.to_numpy()))
+        summary.insert(1, 'Organization', self.org_names.take(self.user_orgs.take(summary.index.to_numpy())))
+        self.user_summary = summary
+
+    def make_read_only(self):
+        # Lock the index arrays (including the row positions per user) against writes, so a report that
+        # tries to modify them fails instead of changing them for every session. The DataFrames are
+        # protected by handing each session its own shallow copy (session_view).
+        for value in vars(self).values():
+            arrays = value.values() if isinstance(value, dict) else [value]
+            for array in arrays:
+                if isinstance(array, np.ndarray):
+                    array.flags.writeable = False
+
+    def session_view(self):
+        # Return a copy for one session that shares all data with this one. Its DataFrames are shallow
+        # copies, so with copy-on-write any in-place change (cell writes, new columns, inplace=True, ...)
+        # copies the touched columns for that session only and the shared tables stay unchanged.
+        view = copy.copy(self)
+        for name, value in vars(self).items():
+            if isinstance(value, (pd.DataFrame, pd.Series)):
+                setattr(view, name, value.copy(deep=False))
+        return view
+
+    def spark_name(self, spark_ids):
+        # Resolve Spark IDs to names with one vectorized take
+        return self.spark_names.take(np.asarray(spark_ids))
+
+    def user(self, user_id):
+        # Return the users row of one User ID
+        return self.users.iloc[self.user_rows[user_id]]
+
+    def user_logs(self, user_id, start_date, end_date):
+        # Return the accesses of one user in the date range, using the precomputed row positions
+        rows = self.user_log_rows.get(user_id, np.array([], dtype=np.int64))
+        user_logs = self.access_logs.iloc[rows]
+        dates = user_logs['Timestamp'].dt.date
+        return user_logs[(dates >= start_date) & (dates <= end_date)]
+
+    def user_activity(self, user_id, start_date, end_date):
+        # Return the count and minutes of every activity of one user in the date range. The whole log range
+        # is read from the precomputed summary; shorter ranges only aggregate that user's rows.
+        if start_date <= self.days[0].date() and end_date >= self.days[-1].date():
+            counts = self.user_summary.loc[[user_id], ACTIVITIES].to_numpy()[0]
+            minutes = self.user_summary.loc[[user_id], [col + ' (min)' for col in ACTIVITIES]].to_numpy()[0]
+        else:
+            user_logs = self.user_logs(user_id, start_date, end_date)
+            performed = user_logs[ACTIVITIES].astype(bool)
+            counts = performed.sum().to_numpy()
+            minutes = performed.mul(user_logs['Session Length (min)'], axis=0).sum().to_numpy()
+        return pd.DataFrame({'Count': counts, 'Minutes': minutes}, index=pd.Index(ACTIVITIES, name='Activity'))
+
+    def site_list(self, site_ids):
+        # Return the work addresses of the given site IDs in address order (unknown sites are skipped)
+        site_ids = pd.unique(site_ids[site_ids >= 0])
+        return self.sites.loc[sorted(site_ids), 'Work Address']
+
+
+# Activity flags of an access, in the column order of access_logs.csv
+ACTIVITIES = [
+    'Viewed Slideshow', 'Downloaded Slideshow', 'Watched Tutorial Video',
+    'Accessed Extension Activities', 'Used AI Playbook Maker',
+    'Downloaded AI Playbook', 'Booked Support Session'
+]
+
+
+# Function for turning an ID -> value table into a dense array indexed by ID (names[3] is the name of ID 3),
+# so IDs are resolved with take instead of a merge or boolean masks. Also used by the Separated Reports scripts.
+def lookup_array(ids, values, fill=None, size=None):
+    ids = np.asarray(ids)
+    values = np.asarray(values)
+    size = int(max(ids.max(initial=-1) + 1, size or 0))
+    table = np.full(size, fill, dtype=object if fill is None else values.dtype)
+    table[ids] = values
+    return table
+
+
+# Function for hashing the raw bytes of the uploaded files into one dataset fingerprint
+def dataset_fingerprint(*files):
+    digest = hashlib.sha256()
+    for content in files:
+        # Length prefix so the boundaries between files are part of the hash
+        digest.update(len(content).to_bytes(8, 'little'))
+        digest.update(content)
+    return digest.hexdigest()
+
+
+# Function for parsing the four CSV files (as bytes) and building the shared indexes
+def read_report_data(access_logs_csv, users_csv, organizations_csv, sparks_csv):
+    access_logs = pd.read_csv(io.BytesIO(access_logs_csv))
+    users = pd.read_csv(io.BytesIO(users_csv))
+    organizations = pd.read_csv(io.BytesIO(organizations_csv))
+    sparks = pd.read_csv(io.BytesIO(sparks_csv))
+
+    # Convert timestamp column to datetime
+    access_logs['Timestamp'] = pd.to_datetime(access_logs['Timestamp'])
+
+    return ReportData(access_logs, users, organizations, sparks,
+                      fingerprint=dataset_fingerprint(access_logs_csv, users_csv, organizations_csv, sparks_csv))
+
+
+# Function for reading the uploaded CSV files; cached so reruns reuse the parsed and indexed tables
+@st.cache_data(show_spinner="Loading data...")
+def load_data(access_logs_csv, users_csv, organizations_csv, sparks_csv):
+    return read_report_data(access_logs_csv, users_csv, organizations_csv, sparks_csv)
+
+
+# Names of the CSV files expected in a shared dataset directory
+DATASET_FILES = ['access_logs.csv', 'users.csv', 'organizations.csv', 'sparks.csv']
+
+
+# Function for loading the dataset of a server directory once per process. Unlike load_data, which hands every
+# session its own copy, all sessions share the data of one read-only ReportData (each through its own
+# session_view), so memory does not grow with the number of users. `modified` (the files' modification times)
+# makes an updated dataset replace the loaded one.
+@st.cache_resource(show_spinner="Loading shared dataset...", max_entries=1)
+def load_shared_data(directory, modified):
+    contents = []
+    for name in DATASET_FILES:
+        with open(os.path.join(directory, name), 'rb') as f:
+            contents.append(f.read())
+    data = read_report_data(*contents)
+    data.make_read_only()
+    return data
+
+
+# Function for the modification times of a shared dataset directory (the cache key of load_shared_data)
+def dataset_modified(directory):
+    return tuple(os.stat(os.path.join(directory, name)).st_mtime_ns for name in DATASET_FILES)
@@ -0,0 +1,176 @@
+# Purpose: Bulk export of computed report tables for Combined.py as CSV, Parquet or multi-sheet Excel files.
+#          Tables arrive in chunks (e.g. one chunk per organization) and are appended to their files as they come,
+#          so an export of every organization never holds more than one chunk in memory.
+
+#  Libraries
+import os
+import io
+import re
+import zipfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+# Label -> (format, file extension, MIME type) of the supported export formats
+EXPORT_FORMATS = {
+    "Excel (.xlsx)": ('xlsx', 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    "CSV (.zip)": ('csv', 'zip', 'application/zip'),
+    "Parquet (.zip)": ('parquet', 'zip', 'application/zip'),
+}
+
+# Number of rows handed to the Excel writer at a time
+EXCEL_CHUNK_ROWS = 10000
+
+
+# Function for adding constant columns (e.g. the organization) in front of every table of a chunk
+def label_tables(tables, **columns):
+    labelled = {}
+    for name, table in tables.items():
+        table = export_frame(table)
+        for position, (column, value) in enumerate(columns.items()):
+            table.insert(position, column, value)
+        labelled[name] = table
+    return labelled
+
+
+# Function for turning a report table into a flat frame; a named index (e.g. Site ID) is kept as a column
+def export_frame(table):
+    if any(name is not None for name in table.index.names):
+        return table.reset_index()
+    return table.reset_index(drop=True)
+
+
+# Function for a file or sheet name that is valid on every platform and in Excel (max 31 characters)
+def safe_name(name, max_length=31):
+    name = re.sub(r'[\\/*?:\[\]<>|"]', '', name.replace('%', 'Percent'))
+    return name.strip()[:max_length] or 'Table'
+
+
+# Function for a safe name that is not in `used` yet (compared without case, like Excel and some file systems).
+# Names that clash after cleaning or truncation get a numeric suffix, e.g. 'Sessions (2)'. The name is added to `used`.
+def unique_name(name, used, max_length=31):
+    base = safe_name(name, max_length)
+    candidate, number = base, 1
+    while candidate.lower() in used:
+        number += 1
+        suffix = f" ({number})"
+        candidate = base[:max_length - len(suffix)].rstrip() + suffix
+    used.add(candidate.lower())
+    return candidate
+
+
+# Class appending chunks of one table to a CSV file
+class CsvTableWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.header = True
+
+    def write(self, table):
+        table.to_csv(self.file, header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+
+# Class appending chunks of one table to a Parquet file, one row group per chunk
+class ParquetTableWriter:
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+        self.empty = None
+
+    def write(self, table):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # The schema comes from the first non-empty chunk; empty chunks carry no reliable column types
+        if table.empty:
+            if self.empty is None:
+                self.empty = table
+            return
+        if self.writer is None:
+            arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+            self.writer = pq.ParquetWriter(self.path, arrow_table.schema)
+        else:
+            arrow_table = pa.Table.from_pandas(table, schema=self.writer.schema, preserve_index=False)
+        self.writer.write_table(arrow_table)
+
+    def close(self):
+        if self.writer is None:
+            # No rows at all: still write the columns
+            (self.empty if self.empty is not None else pd.DataFrame()).to_parquet(self.path, index=False)
+        else:
+            self.writer.close()
+
+
+# Function for writing chunks of report tables into one file per table, zipped together.
+# Each table has its own writer thread, so different tables are written in parallel while the
+# next chunk is computed; chunks of the same table stay in order.
+def export_zip(chunks, writer_class, extension):
+    with tempfile.TemporaryDirectory() as directory:
+        writers, executors, pending, paths = {}, {}, {}, {}
+        used = set()
+        try:
+            for tables in chunks:
+                for name, table in tables.items():
+                    if name not in writers:
+                        paths[name] = os.path.join(directory, f"{unique_name(name, used, 100)}.{extension}")
+                        writers[name] = writer_class(paths[name])
+                        executors[name] = ThreadPoolExecutor(max_workers=1)
+                    # At most one chunk per table waits in memory
+                    if name in pending:
+                        pending[name].result()
+                    pending[name] = executors[name].submit(writers[name].write, export_frame(table))
+            for future in pending.values():
+                future.result()
+        finally:
+            for name, executor in executors.items():
+                executor.shutdown(wait=True)
+                writers[name].close()
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for path in paths.values():
+                archive.write(path, arcname=os.path.basename(path))
+        return buffer.getvalue()
+
+
+# Function for writing chunks of report tables into one Excel workbook, one sheet per table.
+# The workbook is written in openpyxl's write-only mode, which streams rows instead of keeping cells in memory.
+def export_excel(chunks):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheets = {}
+    used = set()
+    for tables in chunks:
+        for name, table in tables.items():
+            table = export_frame(table)
+            if name not in sheets:
+                sheets[name] = workbook.create_sheet(title=unique_name(name, used))
+                sheets[name].append([str(column) for column in table.columns])
+            sheet = sheets[name]
+            for start in range(0, len(table), EXCEL_CHUNK_ROWS):
+                # Plain object rows with missing values as empty cells
+                rows = table.iloc[start:start + EXCEL_CHUNK_ROWS]
+                values = rows.to_numpy(dtype=object, copy=True)
+                values[rows.isna().to_numpy()] = None
+                for row in values.tolist():
+                    sheet.append(row)
+
+    if not sheets:
+        workbook.create_sheet(title='Empty')
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+# Function for exporting chunks of report tables (dicts of table name -> DataFrame) in the chosen format
+def export_report(chunks, format_label):
+    export_format = EXPORT_FORMATS[format_label][0]
+    if export_format == 'xlsx':
+        return export_excel(chunks)
+    if export_format == 'csv':
+        return export_zip(chunks, CsvTableWriter, 'csv')
+    return export_zip(chunks, ParquetTableWriter, 'parquet')
@@ -2,20 +2,35 @@
 # PA2
 # Purpose: Generate a machine learning process for the severity (3 classes) of accidents that affect traffic in
 #          Maryland.
+#          Every (parameters, fold) result is appended to a checkpoint file as soon as it is done; run with
+#          "python MDTrafficMLProcess.py --resume" to continue interrupted grid searches without refitting them.
 
 
 # Imports needed for ML process
+import os
+import sys
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.decomposition import PCA
-from sklearn.model_selection import GridSearchCV
 from sklearn.linear_model import LogisticRegression, Perceptron
 from sklearn.svm import SVC
 from sklearn.metrics import classification_report, confusion_matrix, ConfusionMatrixDisplay
 
+# Shared grid search of the Machine Learning folder (GridSearchCV with checkpoints)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from search_tools import GridSearch, FitCache, FIT_CACHE_DIR
+
+# Continue the grid searches from their checkpoint files
+RESUME = "--resume" in sys.argv
+
+# Fold results are also kept in the fit cache shared with the other projects (at most FIT_CACHE_MB),
+# so a re-run after changing part of a grid only fits the new combinations
+FIT_CACHE_MB = 100
+fit_cache = FitCache(FIT_CACHE_DIR, FIT_CACHE_MB * 2**20)
+
 # Reading in pre-processed data
 train_df = pd.read_csv("mdtraffic_train.csv", skipinitialspace=True)
 test_df = pd.read_csv("mdtraffic_test.csv", skipinitialspace=True)
@@ -51,13 +66,16 @@ param_grid_lr = {
 
 # --- Grid Search Setup ---
 # Grid search for Logistic Regression
-grid_lr = GridSearchCV(
+grid_lr = GridSearch(
     estimator=pipe_lr,
     param_grid=param_grid_lr,
     scoring='f1_macro',  # Using F1-macro as the scoring metric
     cv=10,               # 10-fold cross validation
     verbose=2,
-    n_jobs=-1
+    n_jobs=-1,
+    checkpoint='lr_checkpoint.jsonl',
+    resume=RESUME,
+    cache=fit_cache
 )
 
 # Fitting on training data
@@ -90,13 +108,16 @@ param_grid_svc = {
 }
 
 # Grid search for SVC kernel
-grid_svc = GridSearchCV(
+grid_svc = GridSearch(
     estimator=pipe_svc,
     param_grid=param_grid_svc,
     scoring='f1_macro',  # Using macro f1 to evaluate performance
     cv=10,
     verbose=2,
-    n_jobs=6
+    n_jobs=6,
+    checkpoint='svc_checkpoint.jsonl',
+    resume=RESUME,
+    cache=fit_cache
 )
 
 # Fitting on training data
@@ -3,7 +3,14 @@
 # Purpose: Machine Learning Multi-Class Perceptron code to classify new data points
 # Perceptron Class was taken from the book with some minor changes to make it a multi-class perceptron
 
+import os
+import json
+import hashlib
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+from scipy import sparse
 
 class Perceptron:
     """Perceptron classifier.
@@ -16,6 +23,25 @@ class Perceptron:
     random_state : int
       Random number generator seed for random weight
       initialization.
+    batch_size : int or None
+      Number of examples per weight update. None (default) is the
+      classic online rule, one update per example. With a batch size,
+      the updates of a whole mini-batch are computed from the same
+      weights with matrix operations and applied at once, which is much
+      faster on large datasets (batch_size=1 matches the online rule).
+    dtype : data type
+      Floating point type of the weights and, in batch mode, of the
+      training data (e.g. np.float32 to halve memory traffic).
+    average : bool
+      Averaged perceptron: after fitting, `w_` and `b_` are the
+      average of the weights over all training steps, which are
+      more stable than the last weights on non-separable data.
+    early_stopping : bool
+      Stop before `n_iter` epochs once an epoch has no errors, or
+      when the number of errors has not improved for `patience`
+      epochs.
+    patience : int
+      Epochs without improvement before early stopping.
     Attributes
     -----------
     w_ : 1d-array
@@ -24,45 +50,206 @@ class Perceptron:
       Bias unit after fitting.
     errors_ : list
       Number of misclassifications (updates) in each epoch.
+    n_iter_ : int
+      Number of epochs run (smaller than n_iter after early stopping).
 """
 
-    def __init__(self, eta=0.01, n_iter=50, random_state=1):
+    def __init__(self, eta=0.01, n_iter=50, random_state=1, batch_size=None, dtype=np.float64,
+                 average=False, early_stopping=False, patience=5):
         self.eta = eta
         self.n_iter = n_iter
         self.random_state = random_state
+        self.batch_size = batch_size
+        self.dtype = dtype
+        self.average = average
+        self.early_stopping = early_stopping
+        self.patience = patience
 
 
     def fit(self, X, y):
         """Fit training data.
         Parameters
         ----------
-        X : {array-like}, shape = [n_examples, n_features]
+        X : {array-like, sparse matrix}, shape = [n_examples, n_features]
           Training vectors, where n_examples is the number of
           examples and n_features is the number of features.
+          Sparse input is converted to CSR, and each update only
+          touches the nonzero features of its examples.
         y : array-like, shape = [n_examples]
           Target values.
         Returns
         -------
         self : object
     """
+        self._initialize(X.shape[1])
+        X, y, epoch = self._prepare(X, y)
+        for _ in range(self.n_iter):
+            self.errors_.append(epoch(X, y))
+            if self.early_stopping and _stop_early(self.errors_, self.patience):
+                break
+        self._finish()
+        return self
+
+    def partial_fit(self, X, y):
+        """Continue training with one pass over a chunk of data.
+        Weights, bias and `errors_` are kept between calls (the first
+        call initializes them), so a dataset that does not fit in memory
+        can be trained on chunk by chunk. Each call appends the number
+        of errors of its pass to `errors_`; `n_iter` and early stopping
+        are left to the caller.
+        Parameters
+        ----------
+        X : {array-like, sparse matrix}, shape = [n_examples, n_features]
+          Training vectors of this chunk.
+        y : array-like, shape = [n_examples]
+          Target values of this chunk.
+        Returns
+        -------
+        self : object
+    """
+        if not hasattr(self, 'w_'):
+            self._initialize(X.shape[1])
+        elif self.average:
+            # Train on the raw weights; w_ and b_ hold the average of the previous call
+            self.w_, self.b_ = self._w_raw, self._b_raw
+        X, y, epoch = self._prepare(X, y)
+        self.errors_.append(epoch(X, y))
+        self._finish()
+        return self
+
+    def _initialize(self, n_features):
+        """Set the random initial weights and reset the training state."""
+        dtype = np.dtype(self.dtype).type
         rgen = np.random.RandomState(self.random_state)
         self.w_ = rgen.normal(loc=0.0, scale=0.01,
-                              size=X.shape[1])
-        self.b_ = np.float64(0.)
+                              size=n_features).astype(dtype)
+        self.b_ = dtype(0.)
         self.errors_ = []
-        for _ in range(self.n_iter):
-            errors = 0
-            for xi, target in zip(X, y):
-                update = self.eta * (target - self.predict(xi))
-                self.w_ += update * xi
+
+        # Lazy averaging: instead of adding the weights after every step, each update is also added
+        # to a running sum weighted by its step number; the average is recovered once at the end
+        self._step = 1
+        self._w_sum = np.zeros_like(self.w_)
+        self._b_sum = dtype(0.)
+
+    def _prepare(self, X, y):
+        """Convert the training data for the matching epoch function."""
+        if sparse.issparse(X):
+            X = _as_csr(X, self.w_.dtype)
+            y = np.asarray(y, dtype=self.w_.dtype)
+            return X, y, (self._sparse_online_epoch if self.batch_size is None else self._sparse_batch_epoch)
+        if self.batch_size is None:
+            return X, y, self._online_epoch
+        X = np.ascontiguousarray(X, dtype=self.w_.dtype)
+        y = np.asarray(y, dtype=self.w_.dtype)
+        return X, y, self._batch_epoch
+
+    def _finish(self):
+        """Record the epochs run and publish the averaged weights."""
+        self.n_iter_ = len(self.errors_)
+        if self.average:
+            self._w_raw, self._b_raw = self.w_, self.b_
+            self.w_ = self.w_ - self._w_sum / self._step
+            self.b_ = self.b_ - self._b_sum / self._step
+
+    def _online_epoch(self, X, y):
+        """One pass with an update after every example; returns the number of errors."""
+        # Updates in the weights' dtype, so a float32 model keeps a float32 bias
+        dtype = self.w_.dtype.type
+        errors = 0
+        for xi, target in zip(X, y):
+            update = dtype(self.eta * (target - self.predict(xi)))
+            self.w_ += update * xi
+            self.b_ += update
+            errors += int(update != 0.0)
+            if self.average:
+                if update != 0.0:
+                    self._w_sum += (self._step * update) * xi
+                    self._b_sum += self._step * update
+                self._step += 1
+        return errors
+
+    def _batch_epoch(self, X, y):
+        """One pass with one vectorized update per mini-batch; returns the number of errors."""
+        dtype = self.w_.dtype
+        eta = dtype.type(self.eta)
+
+        # Buffers reused by every batch, so the epoch allocates nothing per batch
+        net = np.empty(self.batch_size, dtype=dtype)
+        update = np.empty(self.batch_size, dtype=dtype)
+        step = np.empty(X.shape[1], dtype=dtype)
+
+        errors = 0
+        for start in range(0, X.shape[0], self.batch_size):
+            Xb = X[start:start + self.batch_size]
+            n = Xb.shape[0]
+
+            # update = eta * (target - prediction) for every example of the batch
+            np.dot(Xb, self.w_, out=net[:n])
+            net[:n] += self.b_
+            np.greater_equal(net[:n], 0.0, out=update[:n])
+            np.subtract(y[start:start + n], update[:n], out=update[:n])
+            update[:n] *= eta
+
+            # Apply the summed updates of the batch in place
+            np.dot(update[:n], Xb, out=step)
+            self.w_ += step
+            self.b_ += update[:n].sum()
+            errors += int(np.count_nonzero(update[:n]))
+            if self.average:
+                step *= self._step
+                self._w_sum += step
+                self._b_sum += self._step * update[:n].sum()
+                self._step += 1
+        return errors
+
+
+    def _sparse_online_epoch(self, X, y):
+        """Online epoch over CSR rows; each example only reads and updates its nonzero features."""
+        indptr, indices, data = X.indptr, X.indices, X.data
+        dtype = self.w_.dtype.type
+        errors = 0
+        for i in range(X.shape[0]):
+            cols = indices[indptr[i]:indptr[i + 1]]
+            vals = data[indptr[i]:indptr[i + 1]]
+            update = dtype(self.eta * (y[i] - float(vals @ self.w_[cols] + self.b_ >= 0.0)))
+            if update != 0.0:
+                self.w_[cols] += update * vals
                 self.b_ += update
-                errors += int(update != 0.0)
-            self.errors_.append(errors)
-        return self
+                errors += 1
+                if self.average:
+                    self._w_sum[cols] += (self._step * update) * vals
+                    self._b_sum += self._step * update
+            self._step += 1
+        return errors
+
+    def _sparse_batch_epoch(self, X, y):
+        """Mini-batch epoch over CSR rows; the update of a batch is scattered onto its nonzero features."""
+        eta = self.w_.dtype.type(self.eta)
+        errors = 0
+        for start in range(0, X.shape[0], self.batch_size):
+            Xb = X[start:start + self.batch_size]
+
+            # update = eta * (target - prediction) for every example of the batch
+            update = y[start:start + Xb.shape[0]] - (Xb @ self.w_ + self.b_ >= 0.0)
+            update *= eta
+
+            # Each stored value x_ij adds update_i * x_ij to w_j
+            step = Xb.data * np.repeat(update, np.diff(Xb.indptr))
+            np.add.at(self.w_, Xb.indices, step)
+            self.b_ += update.sum()
+            errors += int(np.count_nonzero(update))
+            if self.average:
+                np.add.at(self._w_sum, Xb.indices, self._step * step)
+                self._b_sum += self._step * update.sum()
+                self._step += 1
+        return errors
 
 
     def net_input(self, X):
         """Calculate net input"""
+        if sparse.issparse(X):
+            return X @ self.w_ + self.b_
         return np.dot(X, self.w_) + self.b_
 
     # RAW OUTPUT FUNCTION
@@ -76,4 +263,504 @@ class Perceptron:
 
     def predict(self, X):
         """Return class label after unit step"""
-        return np.where(self.net_input(X) >= 0.0, 1, 0)
\ No newline at end of file
+        return np.where(self.net_input(X) >= 0.0, 1, 0)
+
+    def save(self, path, metadata=None):
+        """Write the fitted model to `path` (see save_model)."""
+        save_model(self, path, metadata)
+
+class MultiClassPerceptron:
+    """One-vs-rest multi-class perceptron trained in a single pass.
+    Keeps one weight row per class and updates all of them from the
+    same examples, which gives the same result as training one binary
+    Perceptron per class, without a separate pass over X per class.
+    Parameters
+    ------------
+    eta : float
+      Learning rate (between 0.0 and 1.0)
+    n_iter : int
+      Passes over the training dataset.
+    random_state : int
+      Random number generator seed for random weight
+      initialization. Every class starts from the same weights,
+      as separate binary Perceptrons with this seed would.
+    batch_size : int or None
+      Number of examples per weight update (None: online rule),
+      see Perceptron.
+    dtype : data type
+      Floating point type of the weights.
+    average, early_stopping, patience :
+      Averaged perceptron and early stopping, see Perceptron. Early
+      stopping looks at the errors summed over all classes.
+    Attributes
+    -----------
+    classes_ : 1d-array, shape = [n_classes]
+      Class labels, in the order of the weight rows.
+    W_ : 2d-array, shape = [n_classes, n_features]
+      Weights after fitting, one row per class.
+    b_ : 1d-array, shape = [n_classes]
+      Bias units after fitting.
+    errors_ : list
+      Number of misclassifications (updates) in each epoch,
+      as an array with one count per class.
+    n_iter_ : int
+      Number of epochs run (smaller than n_iter after early stopping).
+"""
+
+    def __init__(self, eta=0.01, n_iter=50, random_state=1, batch_size=None, dtype=np.float64,
+                 average=False, early_stopping=False, patience=5):
+        self.eta = eta
+        self.n_iter = n_iter
+        self.random_state = random_state
+        self.batch_size = batch_size
+        self.dtype = dtype
+        self.average = average
+        self.early_stopping = early_stopping
+        self.patience = patience
+
+    def fit(self, X, y):
+        """Fit training data.
+        Parameters
+        ----------
+        X : {array-like, sparse matrix}, shape = [n_examples, n_features]
+          Training vectors, where n_examples is the number of
+          examples and n_features is the number of features.
+          Sparse input is converted to CSR, and each update only
+          touches the nonzero features of its examples.
+        y : array-like, shape = [n_examples]
+          Target class labels (any labels, e.g. 1, 2, 3).
+        Returns
+        -------
+        self : object
+    """
+        self._initialize(np.unique(np.asarray(y)), X.shape[1])
+        X, y_index, epoch = self._prepare(X, y)
+        for _ in range(self.n_iter):
+            self.errors_.append(epoch(X, y_index))
+            if self.early_stopping and _stop_early(self.errors_, self.patience):
+                break
+        self._finish()
+        return self
+
+    def partial_fit(self, X, y, classes=None):
+        """Continue training with one pass over a chunk of data.
+        See Perceptron.partial_fit. A chunk may not contain every class,
+        so all class labels must be given on the first call.
+        Parameters
+        ----------
+        X : {array-like, sparse matrix}, shape = [n_examples, n_features]
+          Training vectors of this chunk.
+        y : array-like, shape = [n_examples]
+          Target class labels of this chunk.
+        classes : array-like, shape = [n_classes]
+          Every class label of the dataset. Required on the first call,
+          ignored afterwards.
+        Returns
+        -------
+        self : object
+    """
+        if not hasattr(self, 'W_'):
+            if classes is None:
+                raise ValueError("classes must be passed on the first call to partial_fit")
+            self._initialize(np.unique(np.asarray(classes)), X.shape[1])
+        elif self.average:
+            # Train on the raw weights; W_ and b_ hold the average of the previous call
+            self.W_, self.b_ = self._W_raw, self._b_raw
+        X, y_index, epoch = self._prepare(X, y)
+        self.errors_.append(epoch(X, y_index))
+        self._finish()
+        return self
+
+    def _initialize(self, classes, n_features):
+        """Set the classes, the random initial weights and reset the training state."""
+        dtype = np.dtype(self.dtype)
+        self.classes_ = classes
+        rgen = np.random.RandomState(self.random_state)
+        w = rgen.normal(loc=0.0, scale=0.01, size=n_features).astype(dtype)
+        self.W_ = np.tile(w, (len(self.classes_), 1))
+        self.b_ = np.zeros(len(self.classes_), dtype=dtype)
+        self.errors_ = []
+
+        # Step-weighted sums of the updates for lazy averaging (see Perceptron._initialize)
+        self._step = 1
+        self._W_sum = np.zeros_like(self.W_)
+        self._b_sum = np.zeros_like(self.b_)
+
+    def _prepare(self, X, y):
+        """Convert the training data and map the labels to class indices."""
+        dtype = self.W_.dtype
+        X = _as_csr(X, dtype) if sparse.issparse(X) else np.ascontiguousarray(X, dtype=dtype)
+
+        # Column of each example's class; the one-vs-rest targets are built per batch (see _update)
+        y = np.asarray(y)
+        y_index = np.searchsorted(self.classes_, y)
+        if np.any(y_index >= len(self.classes_)) or np.any(self.classes_[np.minimum(y_index, len(self.classes_) - 1)] != y):
+            raise ValueError("y contains labels that are not in classes_")
+        if sparse.issparse(X):
+            return X, y_index, (self._sparse_online_epoch if self.batch_size is None else self._sparse_batch_epoch)
+        return X, y_index, (self._online_epoch if self.batch_size is None else self._batch_epoch)
+
+    def _finish(self):
+        """Record the epochs run and publish the averaged weights."""
+        self.n_iter_ = len(self.errors_)
+        if self.average:
+            self._W_raw, self._b_raw = self.W_, self.b_
+            self.W_ = self.W_ - self._W_sum / self._step
+            self.b_ = self.b_ - self._b_sum / self._step
+
+    def _update(self, net, y_index, eta):
+        """eta * (target - prediction) of a batch for every class; the target is 1 in the column of the class."""
+        update = (net >= 0.0).astype(self.W_.dtype)
+        np.negative(update, out=update)
+        update[np.arange(len(y_index)), y_index] += 1
+        update *= eta
+        return update
+
+    def _online_epoch(self, X, y_index):
+        """One pass with an update after every example; returns the number of errors per class.
+        The net input of all classes is one matrix-vector product per example, and only the
+        classes that were wrong are updated: the true class if it did not fire (+eta * x), and
+        every other class that fired (-eta * x)."""
+        eta = self.W_.dtype.type(self.eta)
+        errors = np.zeros(len(self.classes_), dtype=int)
+        net = np.empty(len(self.classes_), dtype=self.W_.dtype)
+        for xi, target in zip(X, y_index.tolist()):
+            np.dot(self.W_, xi, out=net)
+            net += self.b_
+            missed = net[target] < 0.0
+            net[target] = -1.0
+            fired = np.flatnonzero(net >= 0.0)
+            if missed or len(fired):
+                step = eta * xi
+                if missed:
+                    self.W_[target] += step
+                    self.b_[target] += eta
+                    errors[target] += 1
+                    if self.average:
+                        self._W_sum[target] += self._step * step
+                        self._b_sum[target] += self._step * eta
+                if len(fired):
+                    self.W_[fired] -= step
+                    self.b_[fired] -= eta
+                    errors[fired] += 1
+                    if self.average:
+                        self._W_sum[fired] -= self._step * step
+                        self._b_sum[fired] -= self._step * eta
+            self._step += 1
+        return errors
+
+    def _batch_epoch(self, X, y_index):
+        """One pass with one vectorized update per mini-batch; returns the number of errors per class."""
+        eta = self.W_.dtype.type(self.eta)
+        errors = np.zeros(len(self.classes_), dtype=int)
+        for start in range(0, X.shape[0], self.batch_size):
+            Xb = X[start:start + self.batch_size]
+            update = self._update(Xb @ self.W_.T + self.b_, y_index[start:start + self.batch_size], eta)
+            step = update.T @ Xb
+            self.W_ += step
+            self.b_ += update.sum(axis=0)
+            errors += np.count_nonzero(update, axis=0)
+            if self.average:
+                step *= self._step
+                self._W_sum += step
+                self._b_sum += self._step * update.sum(axis=0)
+            self._step += 1
+        return errors
+
+    def _sparse_online_epoch(self, X, y_index):
+        """Online epoch over CSR rows, as _online_epoch; each example only reads and updates its nonzero features."""
+        indptr, indices, data = X.indptr, X.indices, X.data
+        eta = self.W_.dtype.type(self.eta)
+        errors = np.zeros(len(self.classes_), dtype=int)
+        for i, target in enumerate(y_index.tolist()):
+            cols = indices[indptr[i]:indptr[i + 1]]
+            vals = data[indptr[i]:indptr[i + 1]]
+            net = self.W_[:, cols] @ vals + self.b_
+            missed = net[target] < 0.0
+            net[target] = -1.0
+            fired = np.flatnonzero(net >= 0.0)
+            if missed or len(fired):
+                step = eta * vals
+                if missed:
+                    self.W_[target, cols] += step
+                    self.b_[target] += eta
+                    errors[target] += 1
+                    if self.average:
+                        self._W_sum[target, cols] += self._step * step
+                        self._b_sum[target] += self._step * eta
+                if len(fired):
+                    self.W_[np.ix_(fired, cols)] -= step
+                    self.b_[fired] -= eta
+                    errors[fired] += 1
+                    if self.average:
+                        self._W_sum[np.ix_(fired, cols)] -= self._step * step
+                        self._b_sum[fired] -= self._step * eta
+            self._step += 1
+        return errors
+
+    def _sparse_batch_epoch(self, X, y_index):
+        """Mini-batch epoch over CSR rows; the update of a batch is scattered onto its nonzero features."""
+        eta = self.W_.dtype.type(self.eta)
+        errors = np.zeros(len(self.classes_), dtype=int)
+        for start in range(0, X.shape[0], self.batch_size):
+            Xb = X[start:start + self.batch_size]
+            update = self._update(_sparse_net(Xb, self.W_) + self.b_, y_index[start:start + self.batch_size], eta)
+
+            # Each stored value x_ij adds update_i * x_ij to column j of every class
+            step = Xb.data[:, None] * np.repeat(update, np.diff(Xb.indptr), axis=0)
+            np.add.at(self.W_.T, Xb.indices, step)
+            self.b_ += update.sum(axis=0)
+            errors += np.count_nonzero(update, axis=0)
+            if self.average:
+                np.add.at(self._W_sum.T, Xb.indices, self._step * step)
+                self._b_sum += self._step * update.sum(axis=0)
+            self._step += 1
+        return errors
+
+    @classmethod
+    def from_binary(cls, perceptrons, classes):
+        """Stack fitted binary Perceptrons (one per class, in the
+        order of `classes`) into one multi-class model for scoring."""
+        model = cls(eta=perceptrons[0].eta, n_iter=perceptrons[0].n_iter,
+                    random_state=perceptrons[0].random_state, dtype=perceptrons[0].w_.dtype)
+        model.classes_ = np.asarray(classes)
+        model.W_ = np.vstack([ppn.w_ for ppn in perceptrons])
+        model.b_ = np.array([ppn.b_ for ppn in perceptrons], dtype=model.W_.dtype)
+        model.errors_ = [np.array(errors) for errors in zip(*(ppn.errors_ for ppn in perceptrons))]
+        model.n_iter_ = len(model.errors_)
+        return model
+
+    def net_input(self, X):
+        """Calculate net input of every class, shape = [n_examples, n_classes]"""
+        if sparse.issparse(X):
+            return X @ self.W_.T + self.b_
+        return np.dot(X, self.W_.T) + self.b_
+
+    def raw_output(self, X, chunk_size=None, n_jobs=1, dtype=None):
+        """Return the raw output value of every class (without thresholding).
+        Computed chunk by chunk into one preallocated array, see predict."""
+        dtype = np.dtype(dtype or self.W_.dtype)
+        out = np.empty((X.shape[0], len(self.classes_)), dtype=dtype)
+
+        def write(net, start, stop):
+            out[start:stop] = net
+        self._score(X, write, chunk_size, n_jobs, dtype)
+        return out
+
+    def predict(self, X, chunk_size=None, n_jobs=1, dtype=None):
+        """Return the class label with the highest net input.
+        Parameters
+        ----------
+        X : {array-like, sparse matrix}, shape = [n_examples, n_features]
+        chunk_size : int or None
+          Rows scored at a time. None picks a chunk whose inputs and
+          outputs fit in about 1 MB of cache; memory use stays bounded by
+          the chunk, whatever the size of X.
+        n_jobs : int or None
+          Number of threads scoring chunks in parallel (the matrix
+          products release the GIL). -1 or None uses every CPU, -2 all
+          but one, and so on.
+        dtype : data type or None
+          Floating point type used for scoring, e.g. np.float32 for
+          twice the throughput. Defaults to the weights' dtype.
+        Returns
+        -------
+        labels : 1d-array, shape = [n_examples]
+    """
+        best = np.empty(X.shape[0], dtype=np.intp)
+
+        def write(net, start, stop):
+            np.argmax(net, axis=1, out=best[start:stop])
+        self._score(X, write, chunk_size, n_jobs, np.dtype(dtype or self.W_.dtype))
+        return self.classes_.take(best)
+
+    def save(self, path, metadata=None):
+        """Write the fitted model to `path` (see save_model)."""
+        save_model(self, path, metadata)
+
+    def _score(self, X, write, chunk_size, n_jobs, dtype):
+        """Compute the net input of X chunk by chunk and pass each chunk to write(net, start, stop)."""
+        if not sparse.issparse(X):
+            X = np.asarray(X)
+        n_examples, n_classes = X.shape[0], len(self.classes_)
+
+        # Weights stacked once, transposed and contiguous, in the scoring dtype
+        WT = np.ascontiguousarray(self.W_.T, dtype=dtype)
+        b = self.b_.astype(dtype)
+        if chunk_size is None:
+            chunk_size = max(256, 2 ** 20 // (dtype.itemsize * (X.shape[1] + n_classes)))
+
+        # One reusable output buffer per thread
+        buffers = threading.local()
+
+        def score(start):
+            stop = min(start + chunk_size, n_examples)
+            if getattr(buffers, 'net', None) is None:
+                buffers.net = np.empty((chunk_size, n_classes), dtype=dtype)
+            net = buffers.net[:stop - start]
+            Xc = X[start:stop]
+            if sparse.issparse(Xc):
+                net[...] = Xc @ WT
+            else:
+                np.dot(Xc.astype(dtype, copy=False), WT, out=net)
+            net += b
+            write(net, start, stop)
+
+        starts = range(0, n_examples, chunk_size)
+        n_jobs = _n_threads(n_jobs)
+        if n_jobs == 1 or len(starts) == 1:
+            for start in starts:
+                score(start)
+        else:
+            with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+                list(executor.map(score, starts))
+
+
+# Function for the number of threads of n_jobs: -1 or None means every CPU, -2 all but one, ...
+def _n_threads(n_jobs):
+    if n_jobs is None:
+        n_jobs = -1
+    if n_jobs < 0:
+        n_jobs = (os.cpu_count() or 1) + 1 + n_jobs
+    if n_jobs < 1:
+        raise ValueError("n_jobs must be a positive number of threads, or -1 for every CPU")
+    return int(n_jobs)
+
+
+# Function for converting sparse input to CSR with the weights' dtype and no duplicate entries
+def _as_csr(X, dtype):
+    X = sparse.csr_matrix(X, dtype=dtype)
+    if not X.has_canonical_format:
+        X = X.copy()
+        X.sum_duplicates()
+    return X
+
+
+# Function for Xb @ W.T on a CSR batch that only reads the weight columns of its nonzero features
+# (scipy would copy the whole transposed weight matrix, O(n_features * n_classes) per batch)
+def _sparse_net(Xb, W):
+    rows = np.repeat(np.arange(Xb.shape[0]), np.diff(Xb.indptr))
+    net = np.zeros((Xb.shape[0], W.shape[0]), dtype=W.dtype)
+    np.add.at(net, rows, W[:, Xb.indices].T * Xb.data[:, None])
+    return net
+
+
+# Function deciding early stopping from the errors per epoch (counts, or arrays of counts per class):
+# stop after an epoch without errors, or when the best epoch is `patience` epochs ago
+def _stop_early(errors, patience):
+    totals = [int(np.sum(epoch_errors)) for epoch_errors in errors]
+    if totals[-1] == 0:
+        return True
+    return len(totals) - 1 - int(np.argmin(totals)) >= patience
+
+
+# Model file layout: magic bytes, header length (uint32, little-endian), JSON header, then the raw
+# little-endian arrays, each starting on a 64-byte boundary so they can be memory-mapped directly
+MODEL_MAGIC = b'PPNMODEL'
+ALIGNMENT = 64
+PARAMS = ['eta', 'n_iter', 'random_state', 'batch_size', 'dtype', 'average', 'early_stopping', 'patience']
+
+
+def _aligned(position):
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+# Function for a JSON value of a parameter: numpy scalars (e.g. n_iter taken from a grid) become Python numbers
+def _json_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# Function for the parameters of a model as stored in a model file, e.g. to check a loaded model was
+# trained with the wanted settings: model_params(load_model(path)) == model_params(MultiClassPerceptron(...))
+def model_params(model):
+    params = {name: _json_value(getattr(model, name)) for name in PARAMS}
+    params['dtype'] = np.dtype(model.dtype).str
+    return params
+
+
+# Function for a fingerprint of training data (shape and hash of X and y), to store as model metadata
+# and tell whether a saved model was trained on the same data
+def data_fingerprint(X, y):
+    X, y = np.ascontiguousarray(X), np.ascontiguousarray(y)
+    digest = hashlib.sha256()
+    for array in (X, y):
+        digest.update(f'{array.dtype.str}{array.shape}'.encode('utf-8'))
+        digest.update(array.tobytes())
+    return {'shape': list(X.shape), 'sha256': digest.hexdigest()}
+
+
+# Function for writing a fitted Perceptron or MultiClassPerceptron as header + raw arrays.
+# `metadata` is an optional JSON-serializable dict kept in the header (e.g. the data_fingerprint of
+# the training data) and available as `metadata_` on the loaded model.
+def save_model(model, path, metadata=None):
+    if isinstance(model, MultiClassPerceptron):
+        arrays = {'W_': model.W_, 'b_': model.b_}
+    else:
+        arrays = {'w_': model.w_, 'b_': np.atleast_1d(model.b_).astype(model.w_.dtype)}
+    arrays = {name: np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<')) for name, array in arrays.items()}
+
+    # Offsets are relative to the first aligned byte after the header
+    header = {
+        'model': type(model).__name__,
+        'params': model_params(model),
+        'metadata': metadata or {},
+        'errors_': [np.asarray(errors).tolist() for errors in model.errors_],
+        'arrays': {},
+    }
+    if isinstance(model, MultiClassPerceptron):
+        header['classes_'] = model.classes_.tolist()
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {'offset': offset, 'shape': list(array.shape), 'dtype': array.dtype.str}
+        offset = _aligned(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode('utf-8')
+
+    with open(path, 'wb') as f:
+        f.write(MODEL_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+        data_start = _aligned(f.tell())
+        for name, array in arrays.items():
+            f.write(b'\0' * (data_start + header['arrays'][name]['offset'] - f.tell()))
+            f.write(array.tobytes())
+
+
+# Function for reading a model written by save_model. With mmap_mode='r' (default) the weights are
+# memory-mapped instead of read, so loading is instant and processes scoring with the same file share
+# one copy of the weights. Loaded models are for prediction; their weights are read-only.
+# A truncated or corrupt file raises ValueError, whatever part of it is damaged.
+def load_model(path, mmap_mode='r'):
+    try:
+        return _read_model(path, mmap_mode)
+    except (struct.error, KeyError, TypeError, IndexError) as error:
+        raise ValueError(f"{path} is not a valid perceptron model file: {error!r}") from error
+
+
+def _read_model(path, mmap_mode):
+    with open(path, 'rb') as f:
+        if f.read(len(MODEL_MAGIC)) != MODEL_MAGIC:
+            raise ValueError(f"{path} is not a perceptron model file")
+        header_length, = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    data_start = _aligned(len(MODEL_MAGIC) + 4 + header_length)
+
+    arrays = {}
+    for name, info in header['arrays'].items():
+        dtype, shape = np.dtype(info['dtype']), tuple(info['shape'])
+        if mmap_mode is not None and np.prod(shape) > 0:
+            arrays[name] = np.memmap(path, dtype=dtype, mode=mmap_mode, offset=data_start + info['offset'], shape=shape)
+        else:
+            arrays[name] = np.fromfile(path, dtype=dtype, count=int(np.prod(shape)),
+                                       offset=data_start + info['offset']).reshape(shape)
+
+    params = dict(header['params'], dtype=np.dtype(header['params']['dtype']).type)
+    if header['model'] == 'MultiClassPerceptron':
+        model = MultiClassPerceptron(**params)
+        model.classes_ = np.array(header['classes_'])
+        model.W_, model.b_ = arrays['W_'], arrays['b_']
+        model.errors_ = [np.array(errors) for errors in header['errors_']]
+    else:
+        model = Perceptron(**params)
+        model.w_, model.b_ = arrays['w_'], arrays['b_'][0]
+        model.errors_ = header['errors_']
+    model.n_iter_ = len(model.errors_)
+    model.metadata_ = header.get('metadata', {})
+    return model
@@ -0,0 +1,122 @@
+# Purpose: Benchmark of the Perceptron classes on synthetic data of several sizes.
+# For each scale (samples, features, classes) it times fit, predict and raw_output of the binary Perceptron,
+# the one-vs-rest loop of one binary Perceptron per class, online and mini-batch fit, predict and raw_output of
+# the MultiClassPerceptron and fit and predict of scikit-learn's Perceptron, and records the peak memory
+# allocated by each step (tracemalloc). The online MultiClassPerceptron fit is compared to the loop it replaces.
+# Results are written as JSON so runs of different versions of Perceptron.py can be compared.
+#
+# Usage: python benchmark.py [--output benchmark_results.json] [--repeats 3] [--quick]
+
+# Importing all packages and functions that will be used throughout the program
+from Perceptron import Perceptron, MultiClassPerceptron
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import sklearn
+from sklearn.datasets import make_classification
+from sklearn.linear_model import Perceptron as SkPerceptron
+
+# (n_samples, n_features, n_classes) of every benchmark case
+SCALES = [
+    (1000, 10, 3),
+    (10000, 10, 3),
+    (10000, 100, 3),
+    (10000, 100, 10),
+    (100000, 20, 3),
+    (100000, 100, 10),
+]
+QUICK_SCALES = SCALES[:2]
+N_ITER = 5          # epochs of every fit
+ETA = 0.01
+BATCH_SIZE = 256   # mini-batch size of the batch fit steps
+
+
+# MEASURE FUNCTION
+# Purpose: time a function and record the peak memory it allocates
+# Parameters: function without arguments, number of repeats
+# Return: dict with best and median time (seconds) and peak allocated memory (bytes)
+def measure(function, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    # A separate run for memory, since tracing slows down the timed runs
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'best_s': min(times), 'median_s': float(np.median(times)), 'peak_bytes': peak}
+
+
+# RUN CASE FUNCTION
+# Purpose: benchmark every step on one synthetic dataset
+# Parameters: number of samples, features and classes, number of repeats
+# Return: dict of the case size and the measurement of every step
+def run_case(n_samples, n_features, n_classes, repeats):
+    X, y = make_classification(n_samples=n_samples, n_features=n_features,
+                               n_informative=min(n_features, max(2, n_classes * 2)),
+                               n_redundant=0, n_classes=n_classes, random_state=1)
+    y_binary = np.where(y == 0, 1, 0)
+    y_per_class = [np.where(y == label, 1, 0) for label in np.unique(y)]
+
+    ppn = Perceptron(eta=ETA, n_iter=N_ITER)
+    mc_ppn = MultiClassPerceptron(eta=ETA, n_iter=N_ITER)
+    mc_batch = MultiClassPerceptron(eta=ETA, n_iter=N_ITER, batch_size=BATCH_SIZE)
+    sk_ppn = SkPerceptron(eta0=ETA, max_iter=N_ITER, tol=None, random_state=1)
+
+    steps = {
+        'perceptron.fit': lambda: ppn.fit(X, y_binary),
+        'perceptron.predict': lambda: ppn.predict(X),
+        'perceptron.raw_output': lambda: ppn.raw_output(X),
+        'perceptron.fit_per_class': lambda: [Perceptron(eta=ETA, n_iter=N_ITER).fit(X, labels)
+                                             for labels in y_per_class],
+        'multiclass.fit': lambda: mc_ppn.fit(X, y),
+        'multiclass.predict': lambda: mc_ppn.predict(X),
+        'multiclass.raw_output': lambda: mc_ppn.raw_output(X),
+        'multiclass.fit_batch': lambda: mc_batch.fit(X, y),
+        'sklearn.fit': lambda: sk_ppn.fit(X, y),
+        'sklearn.predict': lambda: sk_ppn.predict(X),
+    }
+    # Steps run in order, so every predict uses the model fitted just before
+    results = {name: measure(step, repeats) for name, step in steps.items()}
+    return {'n_samples': n_samples, 'n_features': n_features, 'n_classes': n_classes, 'steps': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Perceptron classes on synthetic data.')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file for the results')
+    parser.add_argument('--repeats', type=int, default=3, help='timed runs per step')
+    parser.add_argument('--quick', action='store_true', help='only run the smallest scales')
+    args = parser.parse_args()
+
+    cases = []
+    for n_samples, n_features, n_classes in (QUICK_SCALES if args.quick else SCALES):
+        case = run_case(n_samples, n_features, n_classes, args.repeats)
+        cases.append(case)
+        print(f'n={n_samples} d={n_features} k={n_classes}')
+        for name, result in case['steps'].items():
+            print(f"  {name:24s} {result['best_s'] * 1000:10.2f} ms  {result['peak_bytes'] / 2**20:8.2f} MiB")
+        speedup = case['steps']['perceptron.fit_per_class']['best_s'] / case['steps']['multiclass.fit']['best_s']
+        print(f'  online multiclass fit is {speedup:.1f}x faster than one binary Perceptron per class')
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'scikit-learn': sklearn.__version__,
+        },
+        'settings': {'n_iter': N_ITER, 'eta': ETA, 'batch_size': BATCH_SIZE, 'repeats': args.repeats},
+        'cases': cases,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results saved to {args.output}')
@@ -3,7 +3,7 @@
 # Purpose of Main - Classifying a wine dataset using a multiclass perceptron model with the One vs rest approach
 
 # Importing all packages and functions that will be used throughout the program
-from Perceptron import Perceptron
+from Perceptron import MultiClassPerceptron, load_model, model_params, data_fingerprint
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
@@ -41,42 +41,34 @@ sc.fit(X_train)
 X_train_std = sc.transform(X_train)
 X_test_std = sc.transform(X_test)
 
-# One-vs-Rest Encoding (Creating three binary label sets)
-# Creating new columns of the binary labels that will be passed to each Perceptron
-y_train_binary_labels = pd.DataFrame()
-y_test_binary_labels = pd.DataFrame()
-
-# For each class (1, 2 or 3) in the dataset,
-for cls in np.unique(y_train):
-    # if the label = class, then the binary label is 1
-    y_train_binary_labels[cls] = (y_train == cls).astype(int)
-
-# Testing results of the binary levels
-y_train_binary_labels['Og Label'] = y_train.values
-print(y_train_binary_labels)
-
-
 # Multiclass perceptron, One vs Rest
 # ----------------------------------------------------------
-# Training three Perceptron models, one for each class label
-
-# Initializing an array of perceptrons
-perceptrons = []
-
-# obtaining the unique labels
-unique_labels = np.unique(y)
-
-# for each label
-for label in unique_labels:
-    # Obtain the series of labels of that class
-    labels = y_train_binary_labels[label]
-    ppn = Perceptron(eta = 0.1, n_iter = 50 )
-    # Train the perceptron
-    ppn.fit(X_train_std, labels)
-
+# Training one Perceptron head per class label in the same pass over the data.
+# The model encodes the binary labels itself (label = class -> 1, otherwise 0).
+# The trained model is saved to MODEL_FILE with a fingerprint of its training data; later runs memory-map it
+# instead of retraining, as long as it was trained with the same parameters on the same data.
+# A missing, unreadable or corrupt file is retrained and overwritten.
+MODEL_FILE = 'wine_perceptron.ppn'
+mc_ppn = MultiClassPerceptron(eta = 0.1, n_iter = 50)
+fingerprint = data_fingerprint(X_train_std, y_train)
+try:
+    saved_ppn = load_model(MODEL_FILE)
+except (OSError, ValueError):
+    saved_ppn = None
+if (saved_ppn is not None and type(saved_ppn) is MultiClassPerceptron
+        and model_params(saved_ppn) == model_params(mc_ppn) and saved_ppn.metadata_.get('data') == fingerprint):
+    mc_ppn = saved_ppn
+else:
+    mc_ppn.fit(X_train_std, y_train)
+    mc_ppn.save(MODEL_FILE, metadata={'data': fingerprint})
+
+# Number of updates per epoch, one column per class
+errors = np.array(mc_ppn.errors_)
+
+for i, label in enumerate(mc_ppn.classes_):
     # Code obtained from HW4
     # Plotting number of updates per epoch
-    plt.plot(range(1, len(ppn.errors_) + 1), ppn.errors_, marker='o')
+    plt.plot(range(1, len(errors) + 1), errors[:, i], marker='o')
     plt.title(f"One vs Rest: Class{label}")
     plt.xlabel('Epochs')
     plt.ylabel('Number of updates')
@@ -86,35 +78,24 @@ for label in unique_labels:
 
     # output the final learned bias and weights of each model in the multi-class Perceptron
 
-    print(f'Class{label} learned bias: {ppn.b_}')
-    print(f'Class{label} learned weights: {ppn.w_}')
-
-    # Appending Perceptron object to array
-    perceptrons.append(ppn)
+    print(f'Class{label} learned bias: {mc_ppn.b_[i]}')
+    print(f'Class{label} learned weights: {mc_ppn.W_[i]}')
 
 
 # PREDICT MULTICLASS FUNCTION
 # Purpose: predict the class based on raw outputs
-# Parameters: perceptron array, X data frame
+# Parameters: multi-class perceptron, X data frame
 # Return: predicted classes
-def predict_multiclass(perceptrons, X):
-    # getting raw outputs from each perceptron
-    perceptron_outputs = []
-    for ppn in perceptrons:
-        # appending raw output of each perceptron
-        perceptron_outputs.append(ppn.raw_output(X))
-    # combining outputs into a np array
-    # it must be transposed in order to have columns be classes and rows be each row sample
-    raw_outputs = np.array(perceptron_outputs).T
-
-    # Find the index of the perceptron with the highest output for each sample
-    # Add 1 to match class labels (1, 2, 3)
-    predicted_classes = np.argmax(raw_outputs, axis=1) + 1
+def predict_multiclass(model, X, n_jobs=1):
+    # The raw outputs of every class are computed chunk by chunk with the stacked weights,
+    # and the index of the class with the highest output is mapped back to the class labels (1, 2, 3).
+    # Memory stays bounded by the chunk size, so large X can be scored with several threads.
+    predicted_classes = model.predict(X, n_jobs=n_jobs)
 
     return predicted_classes
 
 # Predict the classes for the test data
-y_pred = predict_multiclass(perceptrons, X_test_std)
+y_pred = predict_multiclass(mc_ppn, X_test_std)
 
 # Confusion matrix generated for test data
 cm = confusion_matrix(y_test, y_pred)
@@ -0,0 +1,63 @@
+# Purpose: Training the multiclass perceptron on a CSV file that does not have to fit in memory.
+# The file is read in chunks: one pass fits the StandardScaler incrementally, then every epoch streams the
+# file again and trains with partial_fit. Peak memory depends on CHUNK_SIZE, not on the size of the file.
+
+# Importing all packages and functions that will be used throughout the program
+from Perceptron import MultiClassPerceptron
+import pandas as pd
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import confusion_matrix
+
+# Settings of the run
+DATA_FILE = 'wine.data'
+CHUNK_SIZE = 32          # rows per chunk read from the file
+N_EPOCHS = 20            # passes over the file
+TEST_EVERY = 5           # every 5th row is held out for testing (20% test set)
+DROPPED_FEATURES = ['Magnesium', 'Proline']   # same features as main.py
+
+
+# READ CHUNKS FUNCTION
+# Purpose: stream the file as (X, y, is_test) chunks
+# Parameters: none
+# Return: generator of feature DataFrame, labels and test-row mask per chunk
+def read_chunks():
+    for chunk in pd.read_csv(DATA_FILE, encoding='utf-8', chunksize=CHUNK_SIZE):
+        X = chunk.drop(['Class'] + DROPPED_FEATURES, axis=1)
+        y = chunk['Class'].to_numpy()
+        # Row numbers continue across chunks, so the split is the same in every pass
+        is_test = chunk.index.to_numpy() % TEST_EVERY == 0
+        yield X, y, is_test
+
+
+# First pass: fit the scaler on the training rows and collect the class labels
+sc = StandardScaler()
+classes = None
+for X, y, is_test in read_chunks():
+    sc.partial_fit(X[~is_test])
+    classes = np.unique(y) if classes is None else np.union1d(classes, y)
+print('Class labels:', classes)
+
+# Training passes: every epoch streams the file again
+# Rows of the file are ordered by class, so each chunk is shuffled and the averaged weights are used
+rgen = np.random.RandomState(1)
+mc_ppn = MultiClassPerceptron(eta=0.1, average=True)
+for epoch in range(N_EPOCHS):
+    epoch_errors = 0
+    for X, y, is_test in read_chunks():
+        X_train_std = sc.transform(X[~is_test])
+        order = rgen.permutation(len(X_train_std))
+        mc_ppn.partial_fit(X_train_std[order], y[~is_test][order], classes=classes)
+        epoch_errors += mc_ppn.errors_[-1].sum()
+    print(f'Epoch {epoch + 1}: {epoch_errors} updates')
+
+# Testing pass: the confusion matrix is summed chunk by chunk
+cm = np.zeros((len(classes), len(classes)), dtype=int)
+for X, y, is_test in read_chunks():
+    if is_test.any():
+        y_pred = mc_ppn.predict(sc.transform(X[is_test]))
+        cm += confusion_matrix(y[is_test], y_pred, labels=classes)
+
+print('Confusion Matrix:')
+print(cm)
+print(f'Test accuracy: {np.trace(cm) / cm.sum():.3f}')
@@ -0,0 +1,110 @@
+# Purpose: Hyperparameter sweep for the multiclass perceptron with k-fold cross-validation.
+# Every (eta, n_iter, random_state) combination is trained and scored on each fold in a process pool.
+# The standardized training set is copied once into shared memory and every worker maps the same buffer,
+# so the data is not pickled for each task. Results are ranked by mean macro-F1, then by mean fit time.
+
+# Importing all packages and functions that will be used throughout the program
+from Perceptron import MultiClassPerceptron
+import os
+import time
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import pandas as pd
+import numpy as np
+from sklearn.model_selection import train_test_split, StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import f1_score, accuracy_score
+
+# Settings of the sweep
+DATA_FILE = 'wine.data'
+RESULTS_FILE = 'sweep_results.csv'
+ETAS = [0.001, 0.01, 0.1, 1.0]
+N_ITERS = [10, 25, 50, 100]
+RANDOM_STATES = [1, 2, 3]
+N_FOLDS = 5
+N_JOBS = os.cpu_count()
+DROPPED_FEATURES = ['Magnesium', 'Proline']   # same features as main.py
+
+# Shared data of a worker process, set once by attach_data
+_X = None
+_y = None
+_memory = None
+
+
+# ATTACH DATA FUNCTION
+# Purpose: worker initializer, maps the shared standardized X without copying it
+# Parameters: shared memory name, shape and dtype of X, labels y
+# Return: none
+def attach_data(name, shape, dtype, y):
+    global _X, _y, _memory
+    _memory = shared_memory.SharedMemory(name=name)
+    _X = np.ndarray(shape, dtype=dtype, buffer=_memory.buf)
+    _y = y
+
+
+# RUN FOLD FUNCTION
+# Purpose: train one parameter combination on one fold and score it on the held out part
+# Parameters: parameter dict, train and validation row indices
+# Return: dict with the parameters, fold scores and fit time
+def run_fold(params, train_idx, valid_idx):
+    model = MultiClassPerceptron(**params)
+    start = time.perf_counter()
+    model.fit(_X[train_idx], _y[train_idx])
+    fit_time = time.perf_counter() - start
+
+    y_pred = model.predict(_X[valid_idx])
+    return dict(params,
+                macro_f1=f1_score(_y[valid_idx], y_pred, average='macro'),
+                accuracy=accuracy_score(_y[valid_idx], y_pred),
+                fit_time=fit_time)
+
+
+# SWEEP FUNCTION
+# Purpose: run every parameter combination on every fold in a process pool
+# Parameters: standardized X, labels y
+# Return: data frame of mean/std scores per combination, best first
+def sweep(X, y):
+    grid = [dict(eta=eta, n_iter=n_iter, random_state=random_state)
+            for eta, n_iter, random_state in itertools.product(ETAS, N_ITERS, RANDOM_STATES)]
+    folds = list(StratifiedKFold(n_splits=N_FOLDS, shuffle=True, random_state=1).split(X, y))
+
+    # One copy of X in shared memory for all workers
+    X = np.ascontiguousarray(X)
+    memory = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+    try:
+        np.ndarray(X.shape, dtype=X.dtype, buffer=memory.buf)[...] = X
+        with ProcessPoolExecutor(max_workers=N_JOBS, initializer=attach_data,
+                                 initargs=(memory.name, X.shape, X.dtype, y)) as executor:
+            futures = [executor.submit(run_fold, params, train_idx, valid_idx)
+                       for params in grid for train_idx, valid_idx in folds]
+            rows = [future.result() for future in futures]
+    finally:
+        memory.close()
+        memory.unlink()
+
+    # Mean and standard deviation over the folds of each combination
+    results = (pd.DataFrame(rows)
+               .groupby(['eta', 'n_iter', 'random_state'])
+               .agg(mean_macro_f1=('macro_f1', 'mean'), std_macro_f1=('macro_f1', 'std'),
+                    mean_accuracy=('accuracy', 'mean'), mean_fit_time=('fit_time', 'mean'))
+               .reset_index())
+    results = results.sort_values(['mean_macro_f1', 'mean_fit_time'], ascending=[False, True], ignore_index=True)
+    results.insert(0, 'rank', np.arange(1, len(results) + 1))
+    return results
+
+
+if __name__ == '__main__':
+    # Same features and 80/20 split as main.py; the sweep only sees the training set
+    dfWine = pd.read_csv(DATA_FILE, encoding='utf-8')
+    X = dfWine.drop(['Class'] + DROPPED_FEATURES, axis=1)
+    y = dfWine['Class'].to_numpy()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=1, stratify=y)
+    X_train_std = StandardScaler().fit_transform(X_train)
+
+    start = time.perf_counter()
+    results = sweep(X_train_std, y_train)
+    print(f'{len(results)} combinations x {N_FOLDS} folds in {time.perf_counter() - start:.1f}s')
+    print(results.head(10).to_string(index=False))
+    results.to_csv(RESULTS_FILE, index=False)
+    print(f'Results saved to {RESULTS_FILE}')
@@ -3,12 +3,42 @@
 # May 5th 2025
 
 # Purpose: Prepare data and perform GridSearchCV for Random Forest using two scoring metrics.
+#          Run with "python randomforest.py halving" to use successive halving, or "python randomforest.py oob"
+#          to tune with out-of-bag scores, instead of the full grid, and with "--resume" to continue an
+#          interrupted grid search from its checkpoint file.
 
+import os
+import sys
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (makes HalvingGridSearchCV importable)
+from sklearn.model_selection import train_test_split, HalvingGridSearchCV
 from sklearn.metrics import classification_report
 
+# Shared grid search of the Machine Learning folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from search_tools import GridSearch, OOBSearch, FitCache, FIT_CACHE_DIR, shared_arrays
+
+# Search mode: "grid" fits every combination on every fold. "halving" (successive halving) scores every
+# combination on a small subsample of the training data first, and only the best 1/HALVING_FACTOR of them
+# move on to the next round with HALVING_FACTOR times more samples, until the last round uses all of it.
+# "oob" fits every combination once on the whole training set and scores it with the out-of-bag rows of its
+# bootstrap samples instead of 5 folds; the best OOB_TOP_K combinations per metric are then confirmed with
+# 5-fold cross-validation (0 = out-of-bag scores only).
+arguments = [argument for argument in sys.argv[1:] if not argument.startswith("--")]
+SEARCH_MODE = arguments[0] if arguments else "grid"
+HALVING_FACTOR = 3
+OOB_TOP_K = 5
+
+# Every (parameters, fold) result of the grid search is appended to CHECKPOINT_FILE as soon as it is done,
+# so partial results can be inspected during the search; with --resume the results in it are not refit
+CHECKPOINT_FILE = "grid_checkpoint.jsonl"
+RESUME = "--resume" in sys.argv
+
+# Fold results are also kept in the fit cache shared with the other projects (at most FIT_CACHE_MB),
+# so a re-run after changing part of the grid only fits the new combinations
+FIT_CACHE_MB = 100
+
 # Load data
 df = pd.read_csv("diabetes_binary.csv")
 
@@ -37,6 +67,13 @@ X_train, X_test, y_train, y_test = train_test_split(
     data, target, stratify=target, test_size=0.25, random_state=42
 )
 
+# Compact training data for the search workers: the features are small whole numbers, so X and y are stored
+# exactly in the smallest dtype (uint8) in one memory-mapped array that every worker attaches to,
+# instead of a float64 copy being sent to each of them
+X_search, y_search = shared_arrays(X_train, y_train)
+print(f"Search data: {X_search.dtype}, {(X_search.nbytes + y_search.nbytes) / 2**20:.1f} MiB "
+      f"(training DataFrame: {X_train.memory_usage(index=False).sum() / 2**20:.1f} MiB)")
+
 # Define the grid of hyperparameters to search over
 # Includes key parameters for random forest and class_weight handling
 parameter_grid = {
@@ -47,25 +84,112 @@ parameter_grid = {
     "max_depth": (5, 10, 15, 20, 25),
 }
 
-# Function to run grid search for the specified scoring metric (e.g., accuracy or f1)
-def grid_search(scoring_metric):
+# Function to reduce successive halving results to the shape of the grid search results:
+# one row per combination, holding the scores of the last (largest) round it reached
+def deepest_results(results_df):
+    results_df = results_df.assign(candidate=results_df["params"].astype(str))
+    first_seen = results_df["candidate"].drop_duplicates()
+    deepest = results_df.drop_duplicates("candidate", keep="last").set_index("candidate").loc[first_seen]
+
+    # Combinations that reached later rounds rank above those eliminated earlier;
+    # within a round they rank by mean test score
+    rank_in_round = deepest.groupby("iter")["mean_test_score"].rank(method="min", ascending=False, na_option="bottom")
+    n_deeper = deepest["iter"].map(lambda i: (deepest["iter"] > i).sum())
+    deepest["rank_test_score"] = (rank_in_round + n_deeper).astype(int)
+
+    return deepest.drop(columns=["iter", "n_resources"]).reset_index(drop=True)
+
+# Scoring metrics of the search; one results file is written per metric
+SCORING_METRICS = ("accuracy", "f1")
+
+# Function to print the training and testing classification reports of a fitted model
+def evaluate(model):
+
+    # Evaluate model on training data
+    print("\nTraining classification report:")
+    y_train_pred = model.predict(X_train)
+    print(classification_report(y_train, y_train_pred))
+
+    # Evaluate model on test data
+    print("\nTesting classification report:")
+    y_test_pred = model.predict(X_test)
+    print(classification_report(y_test, y_test_pred))
+
+# Function to take the results of one metric out of multi-metric results, in the single-metric
+# shape (e.g. mean_test_f1 -> mean_test_score), so the CSV files keep their columns
+def single_metric_results(results_df, metric):
+    score_columns = [column for column in results_df.columns if "_test_" in column or "_train_" in column]
+    metric_columns = [column for column in score_columns if column.endswith(f"_{metric}")]
+    columns = [column for column in results_df.columns if column not in score_columns or column in metric_columns]
+    return results_df[columns].rename(columns={column: column[:-len(metric)] + "score" for column in metric_columns})
+
+# Function to run successive halving for the specified scoring metric (e.g., accuracy or f1).
+# The rounds depend on the metric, so each metric needs its own search.
+def halving_search(scoring_metric):
 
     # Initialize base random forest model
     random_forest = RandomForestClassifier(bootstrap=True, random_state=42)
 
-    # Set up grid search with cross-validation
-    grid_RF = GridSearchCV(
+    # Set up successive halving with cross-validation
+    grid_RF = HalvingGridSearchCV(
         estimator=random_forest,
         param_grid=parameter_grid,
+        factor=HALVING_FACTOR,
+        resource="n_samples",
+        min_resources="exhaust",
         scoring=scoring_metric,
+        refit=False,
         cv=5,
         n_jobs=-1,
         return_train_score=True,
+        random_state=42,
+        verbose=2
+    )
+
+    # Fit the search to the training data
+    grid_RF.fit(X_search, y_search)
+
+    # Convert results to DataFrame for export and analysis
+    results_df = deepest_results(pd.DataFrame(grid_RF.cv_results_))
+
+    # Convert class_weight column to string to avoid issues when analyzing results
+    results_df["param_class_weight"] = results_df["param_class_weight"].astype(str)
+
+    # Refit the best combination on the training set (as in grid_search, on the DataFrame the
+    # evaluation predicts on, rather than the compact search copy) and evaluate it
+    print(f"\nBest parameters for {scoring_metric}: {grid_RF.best_params_}")
+    best_RF = RandomForestClassifier(bootstrap=True, random_state=42, **grid_RF.best_params_).fit(X_train, y_train)
+    evaluate(best_RF)
+
+    return results_df
+
+# Function to run grid search for all scoring metrics at once: every forest is fitted once per fold
+# and scored on every metric, then the best combination of each metric is refit on the training set.
+# Forests are grown with warm start along n_estimators (50 trees, score, 50 more, score, ...), so the
+# four forest sizes of a combination cost about as much as fitting the 200-tree forest once.
+def grid_search(scoring_metrics):
+
+    # Initialize base random forest model
+    random_forest = RandomForestClassifier(bootstrap=True, random_state=42)
+
+    # Set up grid search with cross-validation
+    grid_RF = GridSearch(
+        estimator=random_forest,
+        param_grid=parameter_grid,
+        scoring=list(scoring_metrics),
+        refit=False,
+        cv=5,
+        n_jobs=-1,
+        return_train_score=True,
+        warm_start_param="n_estimators",
+        checkpoint=CHECKPOINT_FILE,
+        resume=RESUME,
+        cache=FitCache(FIT_CACHE_DIR, FIT_CACHE_MB * 2**20),
         verbose=2
     )
 
     # Fit the grid search model to the training data
-    grid_RF.fit(X_train, y_train)
+    grid_RF.fit(X_search, y_search)
 
     # Convert results to DataFrame for export and analysis
     results_df = pd.DataFrame(grid_RF.cv_results_)
@@ -73,24 +197,76 @@ def grid_search(scoring_metric):
     # Convert class_weight column to string to avoid issues when analyzing results
     results_df["param_class_weight"] = results_df["param_class_weight"].astype(str)
 
-    # Evaluate model on training data
-    print("\nTraining classification report:")
-    y_train_pred = grid_RF.predict(X_train)
-    print(classification_report(y_train, y_train_pred))
+    results = {}
+    for metric in scoring_metrics:
+        # Refit the best combination of this metric (first one ranked 1, as GridSearchCV's refit does)
+        best_params = grid_RF.cv_results_["params"][results_df[f"rank_test_{metric}"].idxmin()]
+        print(f"\nBest parameters for {metric}: {best_params}")
+        best_RF = RandomForestClassifier(bootstrap=True, random_state=42, **best_params).fit(X_train, y_train)
+        evaluate(best_RF)
 
-    # Evaluate model on test data
-    print("\nTesting classification report:")
-    y_test_pred = grid_RF.predict(X_test)
-    print(classification_report(y_test, y_test_pred))
+        results[metric] = single_metric_results(results_df, metric)
 
-    return results_df
+    return results
+
+# Function to tune with out-of-bag scores for all scoring metrics at once. The oob_score parameter does not
+# change the model, so combinations that only differ in it share one forest; forests grow along n_estimators
+# with warm start as in grid_search. The best combination of each metric is refit on the training set.
+def oob_search(scoring_metrics):
+
+    # Initialize base random forest model (bootstrap samples are needed for out-of-bag rows)
+    random_forest = RandomForestClassifier(bootstrap=True, random_state=42)
+
+    # Set up the out-of-bag search, confirming the best combinations with cross-validation
+    grid_RF = OOBSearch(
+        estimator=random_forest,
+        param_grid=parameter_grid,
+        scoring=list(scoring_metrics),
+        top_k=OOB_TOP_K,
+        cv=5,
+        refit=False,
+        n_jobs=-1,
+        warm_start_param="n_estimators",
+        cache=FitCache(FIT_CACHE_DIR, FIT_CACHE_MB * 2**20),
+        verbose=2
+    )
+
+    # Fit the search to the training data
+    grid_RF.fit(X_search, y_search)
+
+    # Convert results to DataFrame for export and analysis
+    results_df = pd.DataFrame(grid_RF.cv_results_)
+
+    # Convert class_weight column to string to avoid issues when analyzing results
+    results_df["param_class_weight"] = results_df["param_class_weight"].astype(str)
+
+    results = {}
+    for metric in scoring_metrics:
+        # Refit the best combination of this metric (best CV score among the confirmed ones)
+        best_params = grid_RF.cv_results_["params"][grid_RF.best_index(metric)]
+        print(f"\nBest parameters for {metric}: {best_params}")
+        best_RF = RandomForestClassifier(bootstrap=True, random_state=42, **best_params).fit(X_train, y_train)
+        evaluate(best_RF)
+
+        results[metric] = single_metric_results(results_df, metric)
+
+    return results
 
-# Run GridSearchCV using accuracy as the scoring metric
-print("\nRunning Grid Search for accuracy metric: ")
-accuracy_rf_results = grid_search("accuracy")
-accuracy_rf_results.to_csv("accuracy_results1.csv", index=False)
+# Run the search for every scoring metric
+if SEARCH_MODE == "halving":
+    rf_results = {}
+    for metric in SCORING_METRICS:
+        print(f"\nRunning Successive Halving for {metric} metric: ")
+        rf_results[metric] = halving_search(metric)
+elif SEARCH_MODE == "oob":
+    print(f"\nRunning Out-of-Bag Search for {' and '.join(SCORING_METRICS)} metrics: ")
+    rf_results = oob_search(SCORING_METRICS)
+else:
+    print(f"\nRunning Grid Search for {' and '.join(SCORING_METRICS)} metrics: ")
+    rf_results = grid_search(SCORING_METRICS)
 
-# Run GridSearchCV using F1 score as the scoring metric
-print("\nRunning Grid Search for f1 metric: ")
-f1_rf_results = grid_search("f1")
-f1_rf_results.to_csv("f1_results1.csv", index=False)
+# Save the results of each metric, e.g. accuracy_results1.csv and f1_results1.csv.
+# Successive halving and out-of-bag results are saved next to the full grid results instead of replacing them
+results_suffix = {"halving": "_halving", "oob": "_oob"}.get(SEARCH_MODE, "1")
+for metric, results_df in rf_results.items():
+    results_df.to_csv(f"{metric}_results{results_suffix}.csv", index=False)
@@ -0,0 +1,811 @@
+# Author: Mari Sisco
+# Purpose: Grid search with cross-validation shared by the Machine Learning projects.
+#          GridSearch works like scikit-learn's GridSearchCV (same cv_results_ layout, refit and best_* attributes),
+#          but can grow ensembles incrementally: for every other parameter combination and fold, a forest is
+#          fitted with the smallest n_estimators, scored, then grown with warm_start to the next size and scored
+#          again. The n_estimators axis then costs about as much as fitting the largest forest once.
+#          With a checkpoint file, every (parameters, fold) result is appended to a JSON lines file as soon as it
+#          is done, and resume=True skips the results already in the file, so long searches can be interrupted.
+#          With a FitCache, fold results are also stored under a key of (data, fold, estimator, parameters, metrics)
+#          and reused by any later search, so a re-run with an extended grid only fits the new combinations.
+#          OOBSearch tunes bagged forests without folds: every combination is fitted once on all the data and scored
+#          with its out-of-bag predictions, optionally confirming the top-k combinations with cross-validation.
+#          shared_arrays stores X and y in the smallest exact dtype in one memory-mapped file, which parallel
+#          workers attach to instead of each receiving a copy.
+#          Tasks are dispatched longest first, using fit times recorded in the FitCache by earlier searches and
+#          estimate_cost for combinations never fitted, so workers are not left idle behind a few huge fits.
+#
+# Usage from a project folder:
+#     sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+#     from search_tools import GridSearch
+
+# Imports needed for the search
+import os
+import json
+import atexit
+import shutil
+import time
+import hashlib
+import tempfile
+import warnings
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy.stats import rankdata
+from sklearn.base import clone, is_classifier
+from sklearn.metrics import get_scorer, accuracy_score, balanced_accuracy_score, f1_score
+from sklearn.model_selection import ParameterGrid, check_cv
+
+
+# Folder of the fit cache shared by the projects of the Machine Learning folder
+FIT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fit_cache")
+# File of the fit cache recording the fit time of every combination searched so far
+FIT_TIMES_FILE = "fit_times.json"
+
+
+# Metrics available to OOBSearch, computed from the out-of-bag predictions
+OOB_METRICS = {
+    "accuracy": accuracy_score,
+    "balanced_accuracy": balanced_accuracy_score,
+    "f1": f1_score,
+    "f1_macro": lambda y_true, y_pred: f1_score(y_true, y_pred, average="macro"),
+    "f1_weighted": lambda y_true, y_pred: f1_score(y_true, y_pred, average="weighted"),
+}
+
+
+# Function for taking rows of a DataFrame, Series or array
+def take_rows(data, rows):
+    return data.iloc[rows] if hasattr(data, "iloc") else data[rows]
+
+
+# Function for the smallest dtype that holds every value of a numeric column exactly
+def compact_dtype(values):
+    values = np.asarray(values)
+    if values.dtype.kind == "b":
+        return np.dtype(np.uint8)
+    if values.dtype.kind not in "iuf" or values.size == 0:
+        return values.dtype
+    if values.dtype.kind in "iu" or (np.isfinite(values).all() and (values == np.round(values)).all()):
+        # Whole numbers: the smallest integer type covering their range
+        low, high = values.min(), values.max()
+        for dtype in (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32):
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                return np.dtype(dtype)
+    if values.dtype.kind == "f" and np.array_equal(values.astype(np.float32), values, equal_nan=True):
+        return np.dtype(np.float32)
+    return values.dtype
+
+
+# Function for storing numeric X and y as one compact, read-only memory-mapped array (y is the last column).
+# The dtype is the smallest one holding every column exactly, so values do not change. Returns X and y views;
+# joblib sends memory-mapped arrays to its workers as a reference to the file, so every worker maps the same
+# pages instead of unpickling its own copy. The file is deleted when the program ends.
+def shared_arrays(X, y):
+    frame = pd.DataFrame(X)
+    y = np.asarray(y)
+    dtype = np.result_type(*[compact_dtype(frame[column].to_numpy()) for column in frame.columns], compact_dtype(y))
+    if dtype.kind not in "biuf":
+        raise ValueError(f"shared_arrays needs numeric X and y, got {dtype}")
+
+    directory = tempfile.mkdtemp(prefix="search_data_")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    path = os.path.join(directory, "data.npy")
+    data = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(len(frame), frame.shape[1] + 1))
+    for position, column in enumerate(frame.columns):
+        data[:, position] = frame[column].to_numpy()
+    data[:, -1] = y
+    data.flush()
+    del data
+
+    data = np.load(path, mmap_mode="r")
+    return data[:, :-1], data[:, -1]
+
+
+# Function for a canonical text form of a parameter combination (same combination -> same text)
+def canonical_params(params):
+    return json.dumps(params, sort_keys=True, default=repr)
+
+
+# Function for a canonical text form of an estimator and its parameters (nested estimators by class name)
+def estimator_id(estimator):
+    params = estimator.get_params(deep=True)
+    return type(estimator).__name__ + canonical_params({
+        name: type(value).__name__ if hasattr(value, "get_params") else value for name, value in params.items()})
+
+
+# Function for a rough relative fit cost of an estimator's parameters, used to order tasks before
+# their fit times have been recorded. Only the parameters that drive the cost are considered:
+# forest size and depth, features tried per split, and the C, kernel and gamma of SVMs.
+def estimate_cost(params, n_features):
+    cost = 1.0
+    kernel = next((value for name, value in params.items() if name.split("__")[-1] == "kernel"), None)
+    for name, value in params.items():
+        name = name.split("__")[-1]
+        if name == "n_estimators" and isinstance(value, int):
+            cost *= value
+        elif name == "max_depth" and (value is None or isinstance(value, int)):
+            # Unlimited trees grow until the leaves are pure, usually a few tens of levels
+            cost *= 32 if value is None else value
+        elif name == "max_features" and any(other.split("__")[-1] == "n_estimators" for other in params):
+            cost *= {"sqrt": np.sqrt(n_features), "log2": np.log2(max(n_features, 2)), None: n_features}.get(
+                value, value * n_features if isinstance(value, float) else value if isinstance(value, int) else 1)
+        elif name == "C" and isinstance(value, (int, float)):
+            # Larger C means more iterations of the SVM solver
+            cost *= 1 + np.log1p(value)
+        elif name == "kernel" and value == "poly":
+            cost *= 2
+        elif name == "gamma" and isinstance(value, (int, float)) and kernel != "linear":
+            # A wider kernel (larger gamma) keeps more support vectors. Relative to gamma="auto" (1 / n_features),
+            # which like "scale" leaves the cost unchanged
+            cost *= (1 + np.log1p(value * n_features)) / (1 + np.log1p(1))
+    return cost
+
+
+# Function for the keys fit times are recorded under: estimator and parameters only, so they carry over
+# to changed data
+def cost_keys(estimator, candidates):
+    base = estimator_id(estimator)
+    return [hashlib.sha256((base + canonical_params(params)).encode("utf-8")).hexdigest()
+            for params in candidates]
+
+
+# Function for the expected fit time of every candidate: fit times recorded in the cache scaled to the number
+# of training rows, and for candidates never fitted, estimate_cost scaled to the recorded times (the median
+# ratio between them)
+def expected_costs(estimator, candidates, cache, n_features, n_samples):
+    base = estimator.get_params(deep=True)
+    estimates = np.array([estimate_cost({**base, **params}, n_features) for params in candidates])
+    recorded = cache.fit_times() if cache is not None else {}
+    known = {index: recorded[key][0] * n_samples / recorded[key][1]
+             for index, key in enumerate(cost_keys(estimator, candidates)) if key in recorded}
+    scale = np.median([known[index] / estimates[index] for index in known]) if known else 1.0
+    return [known.get(index, estimates[index] * scale) for index in range(len(candidates))]
+
+
+# Function for a fingerprint of the data (values and column names)
+def data_fingerprint(X, y):
+    digest = hashlib.sha256()
+    for data in (X, y):
+        frame = pd.DataFrame(data)
+        digest.update(repr(list(frame.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+# Class storing fold results (scores and fit times) on disk, one small JSON file per key
+class FitCache:
+    """Size-bounded, least-recently-used cache of fold results shared by searches.
+    Parameters
+    ------------
+    directory : str
+      Folder holding the cache.
+    max_bytes : int
+      Total size of the cache files. When a new entry pushes the cache over
+      this size, the least recently used files are deleted first.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        # Return the cached result, or None if the entry is missing or unreadable
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            result = (entry["fit_time"], entry["score_time"], entry["test_scores"], entry["train_scores"])
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, OSError):
+            self._remove(path)
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key, result):
+        # Write the entry atomically (temp file + rename) so readers never see a partial file
+        fit_time, score_time, test_scores, train_scores = result
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"fit_time": fit_time, "score_time": score_time,
+                           "test_scores": test_scores, "train_scores": train_scores}, f)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self.size += os.path.getsize(path) - old_size
+        except OSError:
+            self._remove(tmp_path)
+            return
+        if self.size > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        # (last use, size, path) of every cache file
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json") or (root == self.directory and name == FIT_TIMES_FILE):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def fit_times(self):
+        # Recorded (fit time per fold, training rows) of every combination, by cost key
+        try:
+            with open(os.path.join(self.directory, FIT_TIMES_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record_fit_times(self, times):
+        # Add or update recorded fit times; written atomically like the entries
+        recorded = self.fit_times()
+        recorded.update(times)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(recorded, f)
+            os.replace(tmp_path, os.path.join(self.directory, FIT_TIMES_FILE))
+        except OSError:
+            self._remove(tmp_path)
+
+    def _evict(self):
+        # Delete the least recently used files until the cache fills at most 90% of max_bytes,
+        # so the folder is not scanned again on every following put
+        entries = self._entries()
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self.size <= 0.9 * self.max_bytes:
+                break
+            self._remove(path)
+            self.size -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Function for fitting one group of candidates on one fold. The candidates of a group only differ in the
+# warm-start parameter, so the estimator is fitted with the smallest value and grown to the next ones.
+# Returns one (fit time, score time, test scores, train scores) tuple per value; fit times are cumulative,
+# i.e. the time it took to grow the estimator to that size.
+def fit_group(estimator, params, warm_values, warm_start_param, X, y, train, test, scorers, return_train_score):
+    X_train, y_train = take_rows(X, train), take_rows(y, train)
+    X_test, y_test = take_rows(X, test), take_rows(y, test)
+
+    estimator = clone(estimator).set_params(**params)
+    if warm_start_param is not None:
+        prefix = warm_start_param[:-len(warm_start_param.split("__")[-1])]
+        estimator.set_params(**{prefix + "warm_start": True})
+
+    results = []
+    fit_time = 0.0
+    for value in warm_values:
+        if warm_start_param is not None:
+            estimator.set_params(**{warm_start_param: value})
+        start = time.perf_counter()
+        with warnings.catch_warnings():
+            # Presets like class_weight="balanced" warn about warm starts on different data; here the data is the same
+            warnings.filterwarnings("ignore", message=".*not recommended for warm_start.*")
+            estimator.fit(X_train, y_train)
+        fit_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        test_scores = {name: scorer(estimator, X_test, y_test) for name, scorer in scorers.items()}
+        score_time = time.perf_counter() - start
+        train_scores = ({name: scorer(estimator, X_train, y_train) for name, scorer in scorers.items()}
+                        if return_train_score else None)
+        results.append((fit_time, score_time, test_scores, train_scores))
+    return results
+
+
+# Function for the param_<name> columns and params list of cv_results_, as in GridSearchCV
+def param_columns(candidates):
+    columns = {}
+    for name in sorted({name for params in candidates for name in params}):
+        values = np.ma.masked_all(len(candidates), dtype=object)
+        for index, params in enumerate(candidates):
+            if name in params:
+                values[index] = params[name]
+        columns[f"param_{name}"] = values
+    columns["params"] = candidates
+    return columns
+
+
+# Function for running one (group, fold) task; the task is returned with its results since they arrive unordered
+def run_task(task, *args):
+    return task, fit_group(*args)
+
+
+# Class running the grid search
+class GridSearch:
+    """Exhaustive search over a parameter grid with cross-validation.
+
+    Parameters
+    ------------
+    estimator : estimator object
+      Estimator (or Pipeline) cloned for every fit.
+    param_grid : dict or list of dicts
+      Parameter values to try, as for GridSearchCV.
+    scoring : str, list of str or dict
+      Scorer name, or several names for multi-metric scoring (a dict maps
+      result suffixes to scorer names).
+    cv : int or cross-validation generator
+      Folds; an int means (Stratified)KFold as in GridSearchCV.
+    n_jobs : int
+      Parallel jobs (-1 = all cores).
+    refit : bool or str
+      Refit the best candidate on all the data. With several metrics,
+      the name of the metric that picks the best candidate (or False).
+    return_train_score : bool
+      Also score each fit on its training fold.
+    warm_start_param : str or None
+      Parameter grown with warm_start instead of refitting, e.g.
+      "n_estimators" (or "rf__n_estimators" in a Pipeline).
+    checkpoint : str or None
+      JSON lines file receiving one line per (parameters, fold) result
+      as soon as it is known, whether fitted or found in the cache. Lines
+      are appended and never duplicated, so the file always holds every
+      result of the search so far.
+    cache : FitCache or None
+      Cache of fold results shared with other searches and runs; results
+      found in it are not refit.
+    resume : bool
+      Keep the results already in the checkpoint file and only fit the
+      rest. Lines of a different search (other data, folds, estimator or
+      metrics) are ignored. Without resume every result is fitted again
+      (or taken from the cache), but the file is still kept.
+    verbose : int
+      Verbosity of the parallel jobs.
+
+    Attributes
+    -----------
+    cv_results_ : dict
+      Same keys and order as GridSearchCV.cv_results_.
+    best_index_, best_params_, best_score_, best_estimator_
+      As in GridSearchCV, when refit is set.
+    """
+
+    def __init__(self, estimator, param_grid, scoring, cv=5, n_jobs=None, refit=True,
+                 return_train_score=False, warm_start_param=None, checkpoint=None, resume=False, cache=None,
+                 verbose=0):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.scoring = scoring
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.refit = refit
+        self.return_train_score = return_train_score
+        self.warm_start_param = warm_start_param
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self.cache = cache
+        self.verbose = verbose
+
+    def _scoring_names(self):
+        # Result suffix -> scorer name; single metric results use the "score" suffix (mean_test_score),
+        # like GridSearchCV
+        if isinstance(self.scoring, str):
+            return {"score": self.scoring}
+        if isinstance(self.scoring, dict):
+            return dict(self.scoring)
+        return {name: name for name in self.scoring}
+
+    def _scorers(self):
+        return {key: get_scorer(name) for key, name in self._scoring_names().items()}
+
+    def _groups(self, candidates):
+        # Indexes of candidates that only differ in the warm-start parameter, ordered by its value
+        if self.warm_start_param is None:
+            return [[index] for index in range(len(candidates))]
+        groups = {}
+        for index, params in enumerate(candidates):
+            others = tuple(sorted((name, repr(value)) for name, value in params.items()
+                                  if name != self.warm_start_param))
+            groups.setdefault(others, []).append(index)
+        return [sorted(group, key=lambda index: candidates[index][self.warm_start_param])
+                for group in groups.values()]
+
+    def _setup_id(self, X, y, scorers):
+        # Identifies what every result depends on besides parameters and folds: data, estimator and metrics
+        digest = hashlib.sha256(data_fingerprint(X, y).encode("utf-8"))
+        digest.update(estimator_id(self.estimator).encode("utf-8"))
+        digest.update(repr([sorted(self._scoring_names().items()), self.return_train_score]).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _fold_ids(self, folds):
+        # One hash per fold of its training and test rows
+        ids = []
+        for train, test in folds:
+            digest = hashlib.sha256(np.asarray(train, dtype=np.int64).tobytes())
+            digest.update(np.asarray(test, dtype=np.int64).tobytes())
+            ids.append(digest.hexdigest())
+        return ids
+
+    def _read_checkpoint(self, search_id):
+        # (canonical params, fold) -> result of the lines written by the same search
+        done = {}
+        if not os.path.exists(self.checkpoint):
+            return done
+        with open(self.checkpoint, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut off by an interruption
+                    continue
+                if record.get("search") != search_id:
+                    continue
+                done[record["params"], record["fold"]] = (record["fit_time"], record["score_time"],
+                                                          record["test_scores"], record["train_scores"])
+        return done
+
+    def fit(self, X, y):
+        candidates = list(ParameterGrid(self.param_grid))
+        scorers = self._scorers()
+        cv = check_cv(self.cv, y, classifier=is_classifier(self.estimator))
+        folds = list(cv.split(X, y))
+        groups = self._groups(candidates)
+        if self.warm_start_param is not None:
+            prefix = self.warm_start_param[:-len(self.warm_start_param.split("__")[-1])]
+            if prefix + "warm_start" not in self.estimator.get_params():
+                raise ValueError(f"{type(self.estimator).__name__} has no {prefix}warm_start parameter")
+
+        # Results per (candidate, fold), starting with the ones saved by an interrupted run
+        keys = [canonical_params(params) for params in candidates]
+        results = {}
+        written = set()
+        if self.checkpoint is not None or self.cache is not None:
+            setup_id = self._setup_id(X, y, scorers)
+            fold_ids = self._fold_ids(folds)
+            search_id = hashlib.sha256((setup_id + "".join(fold_ids)).encode("utf-8")).hexdigest()
+        if self.checkpoint is not None:
+            done = self._read_checkpoint(search_id)
+            written = set(done)
+            if self.resume:
+                results = {(index, fold): done[key, fold] for index, key in enumerate(keys)
+                           for fold in range(len(folds)) if (key, fold) in done}
+
+        # Then the ones computed by earlier searches
+        def cache_key(index, fold):
+            return hashlib.sha256((setup_id + fold_ids[fold] + keys[index]).encode("utf-8")).hexdigest()
+
+        if self.cache is not None:
+            for index in range(len(candidates)):
+                for fold in range(len(folds)):
+                    if (index, fold) not in results:
+                        result = self.cache.get(cache_key(index, fold))
+                        if result is not None:
+                            results[index, fold] = result
+
+        # One task per (group, fold) with results still missing
+        tasks = [(group, fold) for group in groups for fold in range(len(folds))
+                 if any((index, fold) not in results for index in group)]
+
+        # Longest tasks first, so no worker is left with a long fit at the end while the others are idle.
+        # A warm-start group costs as much as its largest candidate.
+        costs = expected_costs(self.estimator, candidates, self.cache, np.shape(X)[1], len(folds[0][0]))
+        tasks.sort(key=lambda task: -max(costs[index] for index in task[0]))
+        outputs = Parallel(n_jobs=self.n_jobs, verbose=self.verbose, return_as="generator_unordered")(
+            delayed(run_task)(
+                (group, fold), self.estimator,
+                {name: value for name, value in candidates[group[0]].items() if name != self.warm_start_param},
+                [candidates[index][self.warm_start_param] for index in group] if self.warm_start_param else [None],
+                self.warm_start_param, X, y, *folds[fold], scorers, self.return_train_score)
+            for group, fold in tasks)
+
+        # The checkpoint is only appended to; each (parameters, fold) of this search is written once
+        checkpoint = None
+        if self.checkpoint is not None:
+            checkpoint = open(self.checkpoint, "a", encoding="utf-8")
+            if checkpoint.tell() > 0:
+                # Start on a new line after a line cut off by an interruption
+                with open(self.checkpoint, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        checkpoint.write("\n")
+
+        def write(index, fold):
+            if checkpoint is None or (keys[index], fold) in written:
+                return
+            fit_time, score_time, test_scores, train_scores = results[index, fold]
+            checkpoint.write(json.dumps({
+                "search": search_id, "params": keys[index], "fold": fold,
+                "fit_time": fit_time, "score_time": score_time,
+                "test_scores": test_scores, "train_scores": train_scores}) + "\n")
+            written.add((keys[index], fold))
+
+        try:
+            # Results known before fitting (from the cache) first, then the fitted ones in the order the tasks
+            # finish. A resumed warm-start group is fitted again as a whole; its results already known are kept.
+            for index, fold in list(results):
+                write(index, fold)
+            if checkpoint is not None:
+                checkpoint.flush()
+            for (group, fold), output in outputs:
+                for index, result in zip(group, output):
+                    if (index, fold) in results:
+                        continue
+                    results[index, fold] = result
+                    if self.cache is not None:
+                        self.cache.put(cache_key(index, fold), result)
+                    write(index, fold)
+                if checkpoint is not None:
+                    checkpoint.flush()
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+        self.cv_results_ = self._cv_results(candidates, len(folds), results, scorers)
+        self.n_splits_ = len(folds)
+        if self.cache is not None:
+            n_samples = len(folds[0][0])
+            self.cache.record_fit_times({key: (float(fit_time), n_samples) for key, fit_time
+                                         in zip(cost_keys(self.estimator, candidates), self.cv_results_["mean_fit_time"])})
+        self._refit(X, y, candidates, scorers)
+        return self
+
+    def _cv_results(self, candidates, n_splits, results, scorers):
+        def per_fold(get):
+            return np.array([[get(results[index, fold]) for fold in range(n_splits)]
+                             for index in range(len(candidates))], dtype=float)
+
+        cv_results = {}
+        for key, column in (("fit_time", 0), ("score_time", 1)):
+            times = per_fold(lambda result: result[column])
+            cv_results[f"mean_{key}"] = times.mean(axis=1)
+            cv_results[f"std_{key}"] = times.std(axis=1)
+
+        cv_results.update(param_columns(candidates))
+
+        for name in scorers:
+            for split, column in (("test", 2), ("train", 3)):
+                if split == "train" and not self.return_train_score:
+                    continue
+                scores = per_fold(lambda result: result[column][name])
+                for fold in range(n_splits):
+                    cv_results[f"split{fold}_{split}_{name}"] = scores[:, fold]
+                cv_results[f"mean_{split}_{name}"] = scores.mean(axis=1)
+                cv_results[f"std_{split}_{name}"] = scores.std(axis=1)
+                if split == "test":
+                    means = np.nan_to_num(scores.mean(axis=1), nan=-np.inf)
+                    cv_results[f"rank_test_{name}"] = rankdata(-means, method="min").astype(np.int32)
+        return cv_results
+
+    def _refit(self, X, y, candidates, scorers):
+        if self.refit is False:
+            return
+        metric = self.refit if isinstance(self.refit, str) else "score"
+        if metric not in scorers:
+            raise ValueError(f"refit must name one of the scoring metrics: {list(scorers)}")
+        self.best_index_ = int(np.argmin(self.cv_results_[f"rank_test_{metric}"]))
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = self.cv_results_[f"mean_test_{metric}"][self.best_index_]
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+
+    def predict(self, X):
+        return self.best_estimator_.predict(X)
+
+
+# Function for fitting one group of candidates on all the data and scoring each size of the forest with its
+# out-of-bag predictions. Returns one (fit time, score time, scores) tuple per warm-start value.
+def fit_oob_group(estimator, params, warm_values, warm_start_param, X, y, metrics):
+    estimator = clone(estimator).set_params(**params, oob_score=True)
+    if warm_start_param is not None:
+        estimator.set_params(warm_start=True)
+    y = np.asarray(y)
+
+    results = []
+    fit_time = 0.0
+    for value in warm_values:
+        if warm_start_param is not None:
+            estimator.set_params(**{warm_start_param: value})
+        start = time.perf_counter()
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message=".*not recommended for warm_start.*")
+            # Few trees leave some rows without out-of-bag votes (all-zero rows of oob_decision_function_);
+            # those rows are left out of the scores
+            warnings.filterwarnings("ignore", message=".*do not have OOB scores.*")
+            estimator.fit(X, y)
+        fit_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        votes = estimator.oob_decision_function_
+        scored = np.nansum(votes, axis=1) > 0
+        y_pred = estimator.classes_[np.argmax(votes[scored], axis=1)]
+        scores = {name: float(metric(y[scored], y_pred)) for name, metric in metrics.items()}
+        results.append((fit_time, time.perf_counter() - start, scores))
+    return results
+
+
+# Class tuning a bagged forest with out-of-bag scores
+class OOBSearch:
+    """Search over a parameter grid scored with out-of-bag predictions.
+
+    Every combination is fitted once on all the data (with bootstrap
+    samples), and the rows left out of each tree's sample score it, so no
+    folds are needed. Combinations that only differ in oob_score share a
+    fit, and warm_start_param grows forests as in GridSearch.
+
+    Parameters
+    ------------
+    estimator : forest classifier
+      Bagged forest with oob_score and warm_start parameters
+      (e.g. RandomForestClassifier(bootstrap=True)).
+    param_grid : dict or list of dicts
+      Parameter values to try, as for GridSearchCV.
+    scoring : str or list of str
+      Metric name(s) from OOB_METRICS.
+    top_k : int
+      Number of best combinations per metric confirmed with cross-validation
+      (0 = out-of-bag scores only). The confirmed combination with the best
+      CV score is then the best one.
+    cv, n_jobs, refit, warm_start_param, cache, verbose
+      As in GridSearch.
+
+    Attributes
+    -----------
+    cv_results_ : dict
+      mean_fit_time, mean_score_time, param_*, params, and per metric
+      mean_test_<metric> / rank_test_<metric> (out-of-bag) and, for the
+      confirmed combinations, cv_mean_test_<metric>, cv_std_test_<metric>
+      and cv_rank_test_<metric>.
+    best_index_, best_params_, best_score_, best_estimator_
+      As in GridSearchCV, when refit is set.
+    """
+
+    def __init__(self, estimator, param_grid, scoring, top_k=0, cv=5, n_jobs=None, refit=True,
+                 warm_start_param=None, cache=None, verbose=0):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.scoring = scoring
+        self.top_k = top_k
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.refit = refit
+        self.warm_start_param = warm_start_param
+        self.cache = cache
+        self.verbose = verbose
+
+    def _metrics(self):
+        names = self._scoring_names()
+        unknown = [name for name in names.values() if name not in OOB_METRICS]
+        if unknown:
+            raise ValueError(f"No out-of-bag version of {unknown}; available: {list(OOB_METRICS)}")
+        return {key: OOB_METRICS[name] for key, name in names.items()}
+
+    def fit(self, X, y):
+        candidates = list(ParameterGrid(self.param_grid))
+        metrics = self._metrics()
+        for name in ("oob_score", "warm_start"):
+            if name not in self.estimator.get_params():
+                raise ValueError(f"{type(self.estimator).__name__} has no {name} parameter")
+
+        # Candidates with the same fit: same parameters apart from oob_score and the warm-start value
+        groups = {}
+        for index, params in enumerate(candidates):
+            others = tuple(sorted((name, repr(value)) for name, value in params.items()
+                                  if name not in ("oob_score", self.warm_start_param)))
+            value = params.get(self.warm_start_param)
+            groups.setdefault(others, {}).setdefault(value, []).append(index)
+        groups = [sorted(group.items(), key=lambda item: (item[0] is not None, item[0])) for group in groups.values()]
+
+        # Longest fits first (by recorded fit times, as in GridSearch), so no worker is left with a long fit at
+        # the end while the others are idle. A group costs as much as its largest forest.
+        costs = expected_costs(self.estimator, candidates, self.cache, np.shape(X)[1], np.shape(X)[0])
+        groups.sort(key=lambda group: -costs[group[-1][1][0]])
+
+        outputs = Parallel(n_jobs=self.n_jobs, verbose=self.verbose)(
+            delayed(fit_oob_group)(
+                self.estimator,
+                {name: value for name, value in candidates[group[0][1][0]].items()
+                 if name not in ("oob_score", self.warm_start_param)},
+                [value for value, _ in group], self.warm_start_param if group[0][0] is not None else None,
+                X, y, metrics)
+            for group in groups)
+
+        results = {}
+        for group, output in zip(groups, outputs):
+            for (_, indexes), result in zip(group, output):
+                for index in indexes:
+                    results[index] = result
+
+        cv_results = {
+            "mean_fit_time": np.array([results[index][0] for index in range(len(candidates))]),
+            "mean_score_time": np.array([results[index][1] for index in range(len(candidates))]),
+        }
+        cv_results.update(param_columns(candidates))
+        for name in metrics:
+            scores = np.array([results[index][2][name] for index in range(len(candidates))])
+            cv_results[f"mean_test_{name}"] = scores
+            cv_results[f"rank_test_{name}"] = rankdata(-np.nan_to_num(scores, nan=-np.inf),
+                                                       method="min").astype(np.int32)
+        self.cv_results_ = cv_results
+        if self.cache is not None:
+            self.cache.record_fit_times({key: (float(fit_time), np.shape(X)[0]) for key, fit_time
+                                         in zip(cost_keys(self.estimator, candidates), cv_results["mean_fit_time"])})
+        if self.top_k:
+            self._confirm(X, y, candidates, metrics)
+        self._refit(X, y, candidates, metrics)
+        return self
+
+    def _confirm(self, X, y, candidates, metrics):
+        # Combinations that only differ in oob_score are the same model, so they are confirmed once
+        fit_keys = [canonical_params({name: value for name, value in params.items() if name != "oob_score"})
+                    for params in candidates]
+
+        # The top_k distinct models of every metric, cross-validated in one multi-metric GridSearch
+        top = {}
+        for name in metrics:
+            order = np.argsort(self.cv_results_[f"rank_test_{name}"], kind="stable")
+            top[name] = list(dict.fromkeys(fit_keys[index] for index in order))[:self.top_k]
+        confirmed = sorted({key for keys in top.values() for key in keys})
+        representative = {key: candidates[fit_keys.index(key)] for key in confirmed}
+        search = GridSearch(self.estimator, [{name: [value] for name, value in representative[key].items()}
+                                             for key in confirmed],
+                            scoring=self._scoring_names(),
+                            cv=self.cv, n_jobs=self.n_jobs, refit=False, warm_start_param=self.warm_start_param,
+                            cache=self.cache, verbose=self.verbose).fit(X, y)
+        row = {fit_keys[candidates.index(params)]: position
+               for position, params in enumerate(search.cv_results_["params"])}
+
+        for name in metrics:
+            means = np.full(len(candidates), np.nan)
+            stds = np.full(len(candidates), np.nan)
+            for index, key in enumerate(fit_keys):
+                if key in row:
+                    means[index] = search.cv_results_[f"mean_test_{name}"][row[key]]
+                    stds[index] = search.cv_results_[f"std_test_{name}"][row[key]]
+            # The CV rank only orders the top_k of this metric
+            in_top = np.isin(fit_keys, top[name])
+            ranks = np.full(len(candidates), np.nan)
+            ranks[in_top] = rankdata(-np.nan_to_num(means[in_top], nan=-np.inf), method="min")
+            self.cv_results_[f"cv_mean_test_{name}"] = means
+            self.cv_results_[f"cv_std_test_{name}"] = stds
+            self.cv_results_[f"cv_rank_test_{name}"] = ranks
+
+    def _scoring_names(self):
+        # Result suffix -> metric name, as in GridSearch
+        if isinstance(self.scoring, str):
+            return {"score": self.scoring}
+        return {name: name for name in self.scoring}
+
+    def best_index(self, metric="score"):
+        # Best combination of a metric: the best CV score among the confirmed ones, else the best out-of-bag score
+        ranks = self.cv_results_.get(f"cv_rank_test_{metric}", self.cv_results_[f"rank_test_{metric}"])
+        return int(np.nanargmin(ranks))
+
+    def _refit(self, X, y, candidates, metrics):
+        if self.refit is False:
+            return
+        metric = self.refit if isinstance(self.refit, str) else "score"
+        if metric not in metrics:
+            raise ValueError(f"refit must name one of the scoring metrics: {list(metrics)}")
+        self.best_index_ = self.best_index(metric)
+        self.best_params_ = candidates[self.best_index_]
+        scores = self.cv_results_.get(f"cv_mean_test_{metric}", self.cv_results_[f"mean_test_{metric}"])
+        self.best_score_ = scores[self.best_index_]
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+
+    def predict(self, X):
+        return self.best_estimator_.predict(X)